@@ -51,6 +51,7 @@ class Building(Standing):
 	def receive(self, i, count=1):
 		"""to real store"""
 		self.store[i] += count
+		self.town.transport.stock_changed(self, i)
 		self.update_menu()
 
 	def add_to_store(self, dict_):
@@ -58,6 +59,7 @@ class Building(Standing):
 		for product, count in dict_.items():
 			self.store[product] += count
 			self._store[product] += count
+			self.town.transport.stock_changed(self, product)
 		self.update_menu()
 
 	def provide(self, i, count=1, imaginary=False):
@@ -67,13 +69,21 @@ class Building(Standing):
 		if imaginary:
 			self._store[i] -= count
 			assert self._store[i] >= 0, "Negative product count in {} at {}".format(self.kind, self.pos)
+		self.town.transport.stock_changed(self, i)
 		self.update_menu()
 
+	def reserve(self, i, count=1):
+		"""from imaginary store (booked for delivery)"""
+		self._store[i] -= count
+		self.town.transport.stock_changed(self, i)
+
 	def ask(self):
 		for product in self.in_product:
-			for _ in xrange(self.max_volume - self._store[product]):
-				self.town.transport.book_delivery(product, self, self.priority)
-				self._store[product] += 1
+			count = self.max_volume - self._store[product]
+			if count > 0:
+				self.town.transport.book_delivery(product, self, self.priority, count=count)
+				self._store[product] += count
+				self.town.transport.stock_changed(self, product)
 
 	def produce(self, product): pass
 	def craft(self, subject): pass
@@ -172,7 +182,10 @@ class School(Building):
 		self.recruiting = (0, kind)
 
 	def recruit(self, kind):
-		Citizen.create(kind=kind, pos=to_point(self.grid.get_near_free(to_pos(self.pos))), town=self.town)
+		pos = self.grid.get_near_free(to_pos(self.pos))
+		if pos is None:
+			return # no place around, try later
+		Citizen.create(kind=kind, pos=to_point(pos), town=self.town)
 		self.recruiting = False
 
 	def order(self, kind):
@@ -51,8 +51,7 @@ class Construction(Standing):
 
 	def ask(self):
 		for i in self.price:
-			for _ in xrange(self.price[i]):
-				self.town.transport.book_delivery(i, self, self.priority)
+			self.town.transport.book_delivery(i, self, self.priority, count=self.price[i])
 
 	def receive(self, i, count=1):
 		self.price[i] -= count
@@ -0,0 +1,223 @@
+# Python imports
+from numpy import zeros, int16, int32, argwhere, count_nonzero, logical_and, asarray
+# Game imports
+from grid import Grid
+from core import square
+
+class ArrayLayer(object):
+	"""read-only dict-like view {(x, y): count} of ArrayGrid's counter array"""
+
+	def __init__(self, grid, array):
+		self.grid = grid
+		self.array = array
+
+	def __repr__(self):
+		return "ArrayLayer({}, {})".format(self.grid, self.array.dtype)
+
+	def __str__(self):
+		return "<ArrayLayer of {} occupied pos>".format(len(self))
+
+	def __contains__(self, pos):
+		ij = self.grid.get_ij(pos)
+		return ij is not None and self.array.item(ij) > 0
+
+	def __getitem__(self, pos):
+		count = self.get(pos, 0)
+		if count == 0:
+			raise KeyError(pos)
+		return count
+
+	def get(self, pos, default=None):
+		ij = self.grid.get_ij(pos)
+		count = self.array.item(ij) if ij is not None else 0
+		return count if count > 0 else default
+
+	def __iter__(self):
+		x0, y0 = self.grid.origin
+		return ((int(i) + x0, int(j) + y0) for i, j in argwhere(self.array > 0))
+
+	def keys(self):
+		return list(self)
+
+	def __len__(self):
+		return int(count_nonzero(self.array))
+
+class ArrayGrid(Grid):
+	"""Grid with fixed extent (min_x, min_y, max_x, max_y) (inclusive)
+	backed by int16 counter arrays (2 bytes per pos per layer);
+	pos out of the extent is never free;
+	static_grid and dynamic_grid are dict-like views (see ArrayLayer);
+	single pos are read with array.item (no numpy scalars), one pos units are counted without slices;
+	area_is_free checks the footprint slice of the arrays (one vectorized call),
+	summed-area tables (integral images) of the counters are rebuilt lazily
+	for bulk queries (see get_build_sites)"""
+
+	dtype = int16
+	sat_dtype = int32
+	bounded = True
+
+	def __init__(self, extent):
+		Grid.__init__(self)
+		min_x, min_y, max_x, max_y = extent
+		self.extent = extent
+		self.origin = (min_x, min_y)
+		self.shape = (max_x - min_x + 1, max_y - min_y + 1)
+		self.static_array = zeros(self.shape, dtype=ArrayGrid.dtype)
+		self.dynamic_array = zeros(self.shape, dtype=ArrayGrid.dtype)
+		self.static_grid = ArrayLayer(self, self.static_array)
+		self.dynamic_grid = ArrayLayer(self, self.dynamic_array)
+		# self.list_grid stays dict (side table of lists of objects)
+		sat_shape = (self.shape[0] + 1, self.shape[1] + 1)
+		self._static_sat = zeros(sat_shape, dtype=ArrayGrid.sat_dtype) # sat[i, j] = array[:i, :j].sum()
+		self._dynamic_sat = zeros(sat_shape, dtype=ArrayGrid.sat_dtype)
+		self.static_sat_is_actual = True
+		self.dynamic_sat_is_actual = True
+
+	def __repr__(self):
+		return "ArrayGrid({})".format(self.extent)
+
+	def __str__(self):
+		return "<ArrayGrid {}x{}>".format(*self.shape)
+
+	def get_ij(self, pos):
+		"""(x, y) --> (i, j) array index or None (out of the extent)"""
+		i = pos[0] - self.origin[0]
+		j = pos[1] - self.origin[1]
+		if 0 <= i < self.shape[0] and 0 <= j < self.shape[1]:
+			return (i, j)
+		return None
+
+	def get_slices(self, center_pos, size=0):
+		"""square (2*size+1)x(2*size+1) --> (i slice, j slice) clipped by the extent"""
+		i = center_pos[0] - self.origin[0]
+		j = center_pos[1] - self.origin[1]
+		return (
+			slice(max(i - size, 0), max(min(i + size + 1, self.shape[0]), 0)),
+			slice(max(j - size, 0), max(min(j + size + 1, self.shape[1]), 0)))
+
+	def in_extent(self, pos):
+		return self.get_ij(pos) is not None
+
+	def get_extent(self, margin=1):
+		return self.extent
+
+	def get_positions(self, slices, mask):
+		"""(i slice, j slice), mask of array[slices] --> list of (x, y)"""
+		x0, y0 = self.origin[0] + slices[0].start, self.origin[1] + slices[1].start
+		return [(int(i) + x0, int(j) + y0) for i, j in argwhere(mask)]
+
+	@property
+	def static_sat(self):
+		if not self.static_sat_is_actual:
+			self._static_sat[1:, 1:] = self.static_array.cumsum(axis=0).cumsum(axis=1)
+			self.static_sat_is_actual = True
+		return self._static_sat
+
+	@property
+	def dynamic_sat(self):
+		if not self.dynamic_sat_is_actual:
+			self._dynamic_sat[1:, 1:] = self.dynamic_array.cumsum(axis=0).cumsum(axis=1)
+			self.dynamic_sat_is_actual = True
+		return self._dynamic_sat
+
+	def is_free(self, pos, static=False):
+		"""check if the pos/Point3 is free, not [from] static ==> [from] all"""
+		i = pos[0] - self.origin[0]
+		j = pos[1] - self.origin[1]
+		if not (0 <= i < self.shape[0] and 0 <= j < self.shape[1]):
+			return False
+		if not static: # all
+			return self.static_array.item(i, j) == 0 and self.dynamic_array.item(i, j) == 0
+		else: # buildings
+			return self.static_array.item(i, j) == 0
+
+	def are_free(self, xs, ys, static=False):
+		"""batch is_free: xs, ys --> bool array"""
+		i = asarray(xs, dtype=int) - self.origin[0]
+		j = asarray(ys, dtype=int) - self.origin[1]
+		inside = (i >= 0) & (i < self.shape[0]) & (j >= 0) & (j < self.shape[1])
+		i, j = i[inside], j[inside]
+		free = zeros(len(inside), dtype=bool)
+		if static:
+			free[inside] = self.static_array[i, j] == 0
+		else:
+			free[inside] = (self.static_array[i, j] == 0) & (self.dynamic_array[i, j] == 0)
+		return free
+
+	def area_is_free(self, center_pos, size=0, static=False):
+		"""check if
+		square (2*size+1)x(2*size+1)
+		with center in center_pos is free"""
+		i0, j0 = center_pos[0] - self.origin[0] - size, center_pos[1] - self.origin[1] - size
+		i1, j1 = i0 + 2*size + 1, j0 + 2*size + 1
+		if i0 < 0 or j0 < 0 or i1 > self.shape[0] or j1 > self.shape[1]:
+			return False # out of the extent
+		if self.static_array[i0:i1, j0:j1].any():
+			return False
+		return static or not self.dynamic_array[i0:i1, j0:j1].any()
+
+	def get_build_sites(self, size, rect=None, static=False):
+		"""return list of center pos in rect (min_x, min_y, max_x, max_y)
+		(default: the extent) where area_is_free(pos, size, static)"""
+		min_x, min_y, max_x, max_y = rect or self.extent
+		# centers with the square inside the extent
+		i0 = max(min_x - self.origin[0], size)
+		j0 = max(min_y - self.origin[1], size)
+		i1 = min(max_x - self.origin[0], self.shape[0] - 1 - size) + 1
+		j1 = min(max_y - self.origin[1], self.shape[1] - 1 - size) + 1
+		if i0 >= i1 or j0 >= j1:
+			return []
+		d = 2*size + 1
+		def box_sums(sat):
+			return (sat[i0 - size + d:i1 - size + d, j0 - size + d:j1 - size + d]
+				- sat[i0 - size:i1 - size, j0 - size + d:j1 - size + d]
+				- sat[i0 - size + d:i1 - size + d, j0 - size:j1 - size]
+				+ sat[i0 - size:i1 - size, j0 - size:j1 - size])
+		free = box_sums(self.static_sat) == 0
+		if not static:
+			free = logical_and(free, box_sums(self.dynamic_sat) == 0)
+		return self.get_positions((slice(i0, i1), slice(j0, j1)), free)
+
+	def count_dynamic(self, a, delta):
+		"""dynamic counters of a's square += delta (without slicing for one pos units)"""
+		if a.grid_size == 0:
+			ij = self.get_ij(a.grid_pos)
+			if ij is not None:
+				self.dynamic_array[ij] += delta
+		else:
+			self.dynamic_array[self.get_slices(a.grid_pos, a.grid_size)] += delta
+		self.dynamic_sat_is_actual = False
+
+	def add(self, a):
+		"""add to **dynamic/static/list** grid"""
+		if a.static:
+			slices = self.get_slices(a.grid_pos, a.grid_size)
+			self.static_array[slices] += 1
+			self.static_sat_is_actual = False
+			self.static_changed(blocked=self.get_positions(slices, self.static_array[slices] == 1))
+		else:
+			self.count_dynamic(a, +1)
+			self.dynamic_changed(square(a.grid_pos, a.grid_size))
+			self.units.add(a)
+		for p in square(a.grid_pos, a.grid_size):
+			if p in self.list_grid:
+				self.list_grid[p].append(a)
+			else:
+				self.list_grid[p] = [a]
+
+	def remove(self, a):
+		"""remove from **dynamic/static/list** grid"""
+		if a.static:
+			slices = self.get_slices(a.grid_pos, a.grid_size)
+			self.static_array[slices] -= 1
+			self.static_sat_is_actual = False
+			self.static_changed(freed=self.get_positions(slices, self.static_array[slices] == 0))
+		else:
+			self.count_dynamic(a, -1)
+			self.dynamic_changed(square(a.grid_pos, a.grid_size))
+			self.units.remove(a)
+		for p in square(a.grid_pos, a.grid_size):
+			if len(self.list_grid[p]) == 1:
+				del self.list_grid[p]
+			else:
+				self.list_grid[p].remove(a)
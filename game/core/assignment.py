@@ -0,0 +1,52 @@
+inf = float('inf')
+
+def hungarian(costs):
+	"""costs: n rows of m >= n numbers --> [column of row, ...] with minimal total cost
+	(Hungarian method with potentials, O(n^2*m))"""
+	n = len(costs)
+	if n == 0:
+		return []
+	m = len(costs[0])
+	assert n <= m, "more rows than columns ({} > {})".format(n, m)
+	u = [0]*(n + 1) # row potentials
+	v = [0]*(m + 1) # column potentials
+	p = [0]*(m + 1) # row (1-based) of column, column 0 is a fake one
+	way = [0]*(m + 1)
+	for i in xrange(1, n + 1):
+		p[0] = i
+		j0 = 0
+		minv = [inf]*(m + 1)
+		used = [False]*(m + 1)
+		while True:
+			used[j0] = True
+			i0 = p[j0]
+			row = costs[i0 - 1]
+			delta = inf
+			j1 = 0
+			for j in xrange(1, m + 1):
+				if not used[j]:
+					cur = row[j - 1] - u[i0] - v[j]
+					if cur < minv[j]:
+						minv[j] = cur
+						way[j] = j0
+					if minv[j] < delta:
+						delta = minv[j]
+						j1 = j
+			for j in xrange(m + 1):
+				if used[j]:
+					u[p[j]] += delta
+					v[j] -= delta
+				else:
+					minv[j] -= delta
+			j0 = j1
+			if p[j0] == 0:
+				break
+		while j0 != 0: # augment
+			j1 = way[j0]
+			p[j0] = p[j1]
+			j0 = j1
+	columns = [None]*n
+	for j in xrange(1, m + 1):
+		if p[j] != 0:
+			columns[p[j] - 1] = j - 1
+	return columns
@@ -0,0 +1,71 @@
+# Game imports
+from spatial_hash import SpatialHash
+from transport import Transport
+
+class BuildingIndex(object):
+	"""buildings of a town for nearest queries (see SpatialHash):
+	by kind and by products in imaginary stock (_store) of kinds which might supply them
+	(see Transport.kind_table); buildings report stock changes with update"""
+
+	products = {} # kind --> products it might supply
+
+	def __init__(self, town):
+		self.town = town
+		self.kinds = {} # kind --> SpatialHash of buildings
+		self.suppliers = {i: SpatialHash() for i in Transport.kind_table} # product --> SpatialHash of buildings with it
+		self.producers = {i: set() for i in Transport.kind_table} # product --> not storages with it (surplus to store)
+
+	def __repr__(self):
+		return "BuildingIndex({})".format(self.town)
+
+	def __str__(self):
+		return "<BuildingIndex of {}>".format(self.town)
+
+	@staticmethod
+	def get_products(kind):
+		if kind not in BuildingIndex.products:
+			BuildingIndex.products[kind] = [i for i in Transport.kind_table if kind in Transport.kind_table[i]]
+		return BuildingIndex.products[kind]
+
+	def add(self, building):
+		if building.kind not in self.kinds:
+			self.kinds[building.kind] = SpatialHash()
+		self.kinds[building.kind].add(building)
+		for i in BuildingIndex.get_products(building.kind):
+			self.update(building, i)
+
+	def remove(self, building):
+		self.kinds[building.kind].remove(building)
+		for i in BuildingIndex.get_products(building.kind):
+			self.suppliers[i].remove(building)
+			self.producers[i].discard(building)
+
+	def update(self, building, i):
+		"""imaginary stock of product i in building has changed"""
+		if building.kind not in Transport.kind_table[i] or building not in self.kinds.get(building.kind, ()):
+			return
+		if building._store.get(i, 0) > 0:
+			self.suppliers[i].add(building)
+			if building.kind != 'storage':
+				self.producers[i].add(building)
+		else:
+			self.suppliers[i].remove(building)
+			self.producers[i].discard(building)
+
+	def get_count(self, kind):
+		return len(self.kinds[kind]) if kind in self.kinds else 0
+
+	def get_nearest(self, kind, pos, k=1):
+		"""[building, ...]: up to k nearest to pos (Point) buildings of the kind"""
+		return self.kinds[kind].get_nearest(pos, k=k) if kind in self.kinds else []
+
+	def get_suppliers(self, i, pos, k=1):
+		"""[building, ...]: up to k nearest to pos (Point) buildings which might supply product i"""
+		return self.suppliers[i].get_nearest(pos, k=k)
+
+	def has_supplier(self, i):
+		return len(self.suppliers[i]) > 0
+
+	def get_producers(self, i):
+		"""not storages with product i (it's to be moved to storages)"""
+		return list(self.producers[i])
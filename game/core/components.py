@@ -0,0 +1,271 @@
+# Python imports
+from collections import deque
+from itertools import chain
+# Game imports
+from core import vicinity
+
+class Components(object):
+	"""labels of connected components of static walkable space
+	(4-connected == 8-connected without corner cutting, see Grid.get_moves);
+	labels are kept for pos in grid extent (see Grid.get_extent),
+	out of it pos is blocked (bounded grid) or in the outer component;
+	freed pos merge components (union-find), blocked pos check only if their components split
+	(see split), new pos of grown extent are labeled as freed ones"""
+
+	outer = 0 # label of everything when there are no static objects
+
+	def __init__(self, grid):
+		self.grid = grid
+		self.labels = {} # free pos in extent --> label
+		self.parents = {} # merged label --> label
+		self.extent = None
+		self.n = Components.outer # last used label
+		self.is_actual = False
+
+	def __repr__(self):
+		return "Components({})".format(self.grid)
+
+	def __str__(self):
+		return "<Components of {}>".format(self.grid)
+
+	def in_extent(self, pos):
+		min_x, min_y, max_x, max_y = self.extent
+		return min_x <= pos[0] <= max_x and min_y <= pos[1] <= max_y
+
+	def new_label(self):
+		self.n += 1
+		return self.n
+
+	def find(self, label):
+		"""root of merged labels"""
+		root = label
+		while root in self.parents:
+			root = self.parents[root]
+		while label != root: # path compression
+			next_label = self.parents[label]
+			self.parents[label] = root
+			label = next_label
+		return root
+
+	def union(self, label1, label2):
+		root1, root2 = self.find(label1), self.find(label2)
+		if root1 != root2:
+			self.parents[root2] = root1
+		return root1
+
+	def fill(self, pos, label):
+		"""flood fill free pos in extent from pos with label"""
+		self.labels[pos] = label
+		front = deque([pos])
+		while front:
+			for p in vicinity(front.popleft(), small=True):
+				if self.labels.get(p) != label and self.in_extent(p) and self.grid.is_free(p, static=True):
+					self.labels[p] = label
+					front.append(p)
+
+	def relabel(self):
+		"""label the whole extent"""
+		self.labels = {}
+		self.parents = {}
+		self.extent = self.grid.get_extent()
+		self.is_actual = True
+		if self.extent is None:
+			return
+		min_x, min_y, max_x, max_y = self.extent
+		for x in xrange(min_x, max_x + 1):
+			for y in xrange(min_y, max_y + 1):
+				if (x, y) not in self.labels and self.grid.is_free((x, y), static=True):
+					self.fill((x, y), self.new_label())
+
+	def label(self, pos):
+		"""label free pos joining components of its labeled neighbours"""
+		labels = [self.labels[p] for p in vicinity(pos, small=True) if p in self.labels]
+		if labels:
+			label = labels[0]
+			for l in labels[1:]:
+				label = self.union(label, l)
+		else:
+			label = self.new_label()
+		self.labels[pos] = self.find(label)
+
+	def grow(self, blocked):
+		"""extend the extent to blocked pos with margin (unbounded grid),
+		only new pos of the extent are labeled"""
+		xs, ys = [p[0] for p in blocked], [p[1] for p in blocked]
+		extent = (min(xs) - 1, min(ys) - 1, max(xs) + 1, max(ys) + 1)
+		if self.extent is not None:
+			if self.in_extent(extent[:2]) and self.in_extent(extent[2:]):
+				return
+			extent = tuple(map(min, self.extent[:2], extent[:2]) + map(max, self.extent[2:], extent[2:]))
+		old, self.extent = self.extent, extent
+		for pos in Components.get_frame(extent, old):
+			if self.grid.is_free(pos, static=True):
+				self.label(pos)
+
+	@staticmethod
+	def get_frame(extent, old):
+		"""pos of extent out of old extent (contained in it) or of the whole extent"""
+		min_x, min_y, max_x, max_y = extent
+		if old is None:
+			old = (max_x + 1, min_y, max_x, max_y) # all x are out of it
+		for x in chain(xrange(min_x, old[0]), xrange(old[2] + 1, max_x + 1)):
+			for y in xrange(min_y, max_y + 1):
+				yield (x, y)
+		for x in xrange(max(min_x, old[0]), min(max_x, old[2]) + 1):
+			for y in chain(xrange(min_y, old[1]), xrange(old[3] + 1, max_y + 1)):
+				yield (x, y)
+
+	def split(self, root, starts):
+		"""free pos starts of component root (neighbours of blocked pos) might be cut apart:
+		they are searched from in turns (breadth-first), searches which meet are joined,
+		a search which runs out of pos before it is the only one left is a new component;
+		so blocking visits only pos near it or of the smaller parts of the split component"""
+		owners = {} # pos --> search
+		searches = {} # search --> [front, pos]
+		for pos in starts:
+			if pos not in owners:
+				owners[pos] = pos
+				searches[pos] = [deque([pos]), [pos]]
+		joined = {} # search --> search it's joined to
+		def find(search):
+			while search in joined:
+				search = joined[search]
+			return search
+		while len(searches) > 1:
+			for search in searches.keys():
+				if search not in searches or len(searches) == 1:
+					continue
+				front, positions = searches[search]
+				if not front: # closed part
+					del searches[search]
+					label = self.new_label()
+					for pos in positions:
+						self.labels[pos] = label
+					continue
+				for p in vicinity(front.popleft(), small=True):
+					if p not in self.labels or self.find(self.labels[p]) != root:
+						continue
+					other = find(owners[p]) if p in owners else None
+					if other is None:
+						owners[p] = search
+						front.append(p)
+						positions.append(p)
+					elif other != search:
+						other_front, other_positions = searches.pop(other)
+						joined[other] = search
+						front.extend(other_front)
+						positions.extend(other_positions)
+
+	def update(self, blocked=(), freed=()):
+		"""pos became non-free/free for static objects"""
+		if not self.is_actual:
+			return
+		if blocked and not self.grid.bounded:
+			self.grow(blocked)
+		roots = {}
+		for pos in blocked:
+			if pos in self.labels:
+				roots.setdefault(self.find(self.labels.pop(pos)), [])
+		for pos in blocked:
+			for p in vicinity(pos, small=True):
+				if p in self.labels:
+					root = self.find(self.labels[p])
+					if root in roots:
+						roots[root].append(p)
+		for root in roots:
+			self.split(root, roots[root])
+		for pos in freed:
+			self.label(pos)
+
+	def get_label(self, pos):
+		"""label of component with pos or None (pos is blocked)"""
+		if not self.is_actual:
+			self.relabel()
+		if pos in self.labels:
+			return self.find(self.labels[pos])
+		if self.extent is None:
+			return Components.outer
+		if self.grid.bounded or self.in_extent(pos):
+			return None
+		return self.find(self.labels[self.extent[:2]]) # corner of extent is in the outer component
+
+	def are_connected(self, pos1, pos2):
+		"""check if pos2 might be reached from pos1
+		(pos1 might be blocked, then its neighbours are checked)"""
+		label2 = self.get_label(pos2)
+		if label2 is None:
+			return False
+		label1 = self.get_label(pos1)
+		if label1 is not None:
+			return label1 == label2
+		return any(self.get_label(p) == label2 for p in vicinity(pos1, small=True))
+
+class ObstacleIndex(object):
+	"""obstacles (4-connected sets of static non-free pos) maintained incrementally:
+	blocked pos join (merge) neighbour obstacles, smaller into larger,
+	freed pos split only their own obstacle"""
+
+	def __init__(self, grid):
+		self.grid = grid
+		self.labels = {} # static non-free pos --> label
+		self.obstacles = {} # label --> set of pos
+		self.n = 0 # last used label
+
+	def __repr__(self):
+		return "ObstacleIndex({})".format(self.grid)
+
+	def __str__(self):
+		return "<ObstacleIndex of {} obstacles>".format(len(self.obstacles))
+
+	def new_label(self):
+		self.n += 1
+		return self.n
+
+	def block(self, pos):
+		labels = set(self.labels[p] for p in vicinity(pos, small=True) if p in self.labels)
+		if not labels:
+			label = self.new_label()
+			self.obstacles[label] = set()
+		else:
+			label = max(labels, key=lambda l: len(self.obstacles[l]))
+			labels.remove(label)
+			for l in labels:
+				for p in self.obstacles[l]:
+					self.labels[p] = label
+				self.obstacles[label] |= self.obstacles.pop(l)
+		self.labels[pos] = label
+		self.obstacles[label].add(pos)
+
+	def free(self, pos):
+		obstacle = self.obstacles.pop(self.labels.pop(pos))
+		obstacle.discard(pos)
+		for start in vicinity(pos, small=True):
+			if start in obstacle: # not refilled yet
+				label = self.new_label()
+				part = self.obstacles[label] = set([start])
+				obstacle.remove(start)
+				stack = [start]
+				while stack:
+					for p in vicinity(stack.pop(), small=True):
+						if p in obstacle:
+							obstacle.remove(p)
+							part.add(p)
+							stack.append(p)
+				for p in part:
+					self.labels[p] = label
+
+	def update(self, blocked=(), freed=()):
+		"""pos became non-free/free for static objects"""
+		for pos in blocked:
+			self.block(pos)
+		for pos in freed:
+			self.free(pos)
+
+	def get_label(self, pos):
+		return self.labels.get(pos)
+
+	def get_obstacle(self, pos):
+		"""set of pos (don't modify it) or empty set"""
+		if pos in self.labels:
+			return self.obstacles[self.labels[pos]]
+		return set()
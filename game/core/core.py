@@ -1,6 +1,6 @@
 # Python imports
 from __future__ import division
-from math import sin, cos, pi, e, hypot
+from math import sin, cos, pi, e, hypot, sqrt
 
 # Panda3D imports
 from panda3d.core import (
@@ -23,6 +23,8 @@ class Goal:
 	def __str__(self):
 		return "<Goal at {}>".format(self.pos)
 
+sqrt2 = sqrt(2)
+
 # functions
 
 def distance(a, b):
@@ -34,6 +36,12 @@ def dist(pos1, pos2):
 	(x1, y1), (x2, y2) --> hypot(x1-x2, y1-y2)"""
 	return hypot(pos2[0]-pos1[0], pos2[1]-pos1[1])
 
+def octile(pos1, pos2):
+	"""octile distance (8-connected moves, diagonal costs sqrt(2))
+	(x1, y1), (x2, y2) --> max(dx, dy) + (sqrt(2) - 1)*min(dx, dy)"""
+	dx, dy = abs(pos2[0]-pos1[0]), abs(pos2[1]-pos1[1])
+	return max(dx, dy) + (sqrt2 - 1)*min(dx, dy)
+
 def rotated(v, angle, in_degrees=True):
 	"""flat rotation on angle in degrees (default)
 	Point/V3 --> V3"""
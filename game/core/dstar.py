@@ -0,0 +1,148 @@
+# Python imports
+from heapq import heappush, heappop
+# Game imports
+from core import vicinity, octile
+
+inf = float('inf')
+
+class DStarLite(object):
+	"""incremental replanner (D* Lite) of a moving creature:
+	backward search from the goal keeps g/rhs values between replans,
+	so after grid changes (see Grid.static_changed) only the affected part is repaired;
+	moves are as Grid.get_moves"""
+
+	max_expansions = 1e5
+	search_slice = 64 # expansions between yields of iter_path (see PathScheduler)
+	eps = 1e-9 # keys are sums of floats: ties with the start key are processed too
+
+	def __init__(self, grid, start, goal, static=True):
+		self.grid = grid
+		self.start = self.last = start
+		self.goal = goal
+		self.static = static
+		self.km = 0 # key modifier (start has moved)
+		self.g = {}
+		self.rhs = {goal: 0}
+		self.heap = []
+		self.keys = {} # pos --> actual key in the heap
+		self.changes = set() # changed pos to be processed
+		self.push(goal)
+		self.grid.planners.add(self)
+
+	def __repr__(self):
+		return "DStarLite({}, {}, {}, {})".format(self.grid, self.start, self.goal, self.static)
+
+	def __str__(self):
+		return "<DStarLite from {} to {}>".format(self.start, self.goal)
+
+	def get_key(self, pos):
+		k = min(self.g.get(pos, inf), self.rhs.get(pos, inf))
+		return (k + octile(self.start, pos) + self.km, k)
+
+	def push(self, pos):
+		key = self.keys[pos] = self.get_key(pos)
+		heappush(self.heap, (key, pos))
+
+	def top(self):
+		"""(key, pos) of actual top of the heap or None"""
+		while self.heap and self.keys.get(self.heap[0][1]) != self.heap[0][0]:
+			heappop(self.heap) # outdated
+		return self.heap[0] if self.heap else None
+
+	def update_vertex(self, pos):
+		if pos != self.goal:
+			self.rhs[pos] = min([cost + self.g.get(p, inf) for p, cost in self.grid.get_moves(pos, static=self.static)] or [inf])
+		self.keys.pop(pos, None)
+		if self.g.get(pos, inf) != self.rhs.get(pos, inf):
+			self.push(pos)
+
+	def compute(self):
+		"""(re)compute shortest path from start, return False if expansions limit is exceeded"""
+		for done in self.iter_compute():
+			pass
+		return done
+
+	def iter_compute(self):
+		"""compute as generator: yields None after every DStarLite.search_slice expansions,
+		True/False at the end"""
+		n = 0
+		top = self.top()
+		while top is not None and (top[0][0] <= self.get_key(self.start)[0] + DStarLite.eps or self.rhs.get(self.start, inf) != self.g.get(self.start, inf)):
+			n += 1
+			if n > DStarLite.max_expansions:
+				yield False
+				return
+			if n % DStarLite.search_slice == 0:
+				yield None
+			key, pos = heappop(self.heap)
+			del self.keys[pos]
+			new_key = self.get_key(pos)
+			if key < new_key:
+				self.push(pos)
+			elif self.g.get(pos, inf) > self.rhs.get(pos, inf):
+				self.g[pos] = self.rhs[pos]
+				for p, cost in self.grid.get_moves(pos, static=self.static):
+					self.update_vertex(p)
+			else:
+				self.g[pos] = inf
+				self.update_vertex(pos)
+				for p, cost in self.grid.get_moves(pos, static=self.static):
+					self.update_vertex(p)
+			top = self.top()
+		yield True
+
+	def changed(self, positions):
+		"""pos became non-free/free (remembered only if the search has reached them)"""
+		for pos in positions:
+			if pos in self.rhs or any(p in self.rhs for p in vicinity(pos)):
+				self.changes.add(pos)
+
+	def has_changes(self):
+		return bool(self.changes)
+
+	def repair(self):
+		"""update vertices around changed pos (their moves have changed)"""
+		if self.start != self.last:
+			self.km += octile(self.last, self.start)
+			self.last = self.start
+		for pos in self.changes:
+			for p in (pos,) + vicinity(pos):
+				self.update_vertex(p)
+		self.changes = set()
+
+	def get_path(self, start=None, simplify=False):
+		"""[start, ..., goal] or [] (after repairing and recomputing), see Grid.simplify_path"""
+		for path in self.iter_path(start=start, simplify=simplify):
+			pass
+		return path
+
+	def iter_path(self, start=None, simplify=False):
+		"""get_path as generator: yields None while computing, the path at the end
+		(resumable by PathScheduler)"""
+		if start is not None:
+			self.start = start
+		self.repair()
+		if not self.grid.components.are_connected(self.start, self.goal):
+			yield []
+			return
+		for done in self.iter_compute():
+			if done is None:
+				yield None
+		if not done or self.g.get(self.start, inf) == inf:
+			yield []
+			return
+		path = [self.start]
+		visited = set(path)
+		while path[-1] != self.goal:
+			moves = self.grid.get_moves(path[-1], static=self.static)
+			pos = min(moves, key=lambda m: m[1] + self.g.get(m[0], inf))[0] if moves else None
+			if pos is None or pos in visited:
+				yield []
+				return
+			path.append(pos)
+			visited.add(pos)
+		yield self.grid.simplify_path(path, static=self.static) if simplify else path
+
+	def close(self):
+		"""stop getting grid changes"""
+		self.grid.planners.discard(self)
@@ -0,0 +1,167 @@
+# Python imports
+from heapq import heappush, heappop
+# Game imports
+from core import vicinity
+
+class FlowField(object):
+	"""reverse Dijkstra from goal pos over the grid (moves as Grid.get_moves):
+	walking distance to the nearest goal and next pos towards it for every reached pos;
+	expanded lazily (only as far as asked pos need), shared by all units going to the goals;
+	reset when static objects on the grid change (see Grid.static_version);
+	listening field gets the changes (see Grid.static_changed) and repairs itself locally:
+	pos whose way to the goals passes by blocked pos are forgotten and reached again
+	from their neighbours, neighbours of freed pos are expanded again
+	(pos are expanded again whenever their distance drops; close it when it's not needed)"""
+
+	max_distance = 1e3
+
+	def __init__(self, grid, goals, static=True, listening=False):
+		self.grid = grid
+		self.goals = set(goals)
+		self.static = static
+		self.listening = listening
+		self.reset()
+		if listening:
+			self.grid.planners.add(self)
+
+	def __repr__(self):
+		return "FlowField({}, {}, {}, {})".format(self.grid, self.goals, self.static, self.listening)
+
+	def __str__(self):
+		return "<FlowField to {} goals ({} pos reached)>".format(len(self.goals), len(self.closed))
+
+	def reset(self):
+		self.version = self.grid.static_version
+		self.distances = {} # pos --> (tentative) distance
+		self.next_pos = {} # pos --> next pos towards the nearest goal
+		self.children = {} # pos --> set of pos whose next pos it is
+		self.closed = set() # expanded pos
+		self.heap = []
+		for pos in self.goals:
+			self.seed(pos)
+		self.update_labels()
+
+	def update_labels(self):
+		self.labels = set(self.grid.components.get_label(pos) for pos in self.goals if pos in self.distances)
+
+	def is_actual(self):
+		return self.listening or self.version == self.grid.static_version
+
+	def seed(self, goal):
+		if self.grid.is_free(goal, static=self.static):
+			self.set(goal, 0, None)
+
+	def set(self, pos, d, next_pos):
+		"""new (tentative) distance of pos, it's to be expanded"""
+		self.distances[pos] = d
+		old = self.next_pos.get(pos)
+		if old != next_pos:
+			if old is not None:
+				self.children[old].discard(pos)
+			if next_pos is None:
+				del self.next_pos[pos]
+			else:
+				self.next_pos[pos] = next_pos
+				self.children.setdefault(next_pos, set()).add(pos)
+		heappush(self.heap, (d, pos))
+
+	def forget(self, pos):
+		del self.distances[pos]
+		old = self.next_pos.pop(pos, None)
+		if old in self.children:
+			self.children[old].discard(pos)
+		self.children.pop(pos, None)
+		self.closed.discard(pos)
+
+	def invalidate(self, roots):
+		"""forget roots and pos whose way to the goals passes by them,
+		their reached neighbours are expanded again"""
+		forgotten = set()
+		stack = list(roots)
+		while stack:
+			pos = stack.pop()
+			if pos not in forgotten:
+				forgotten.add(pos)
+				stack.extend(self.children.get(pos, ()))
+		for pos in forgotten:
+			self.forget(pos)
+		for pos in forgotten:
+			if pos in self.goals:
+				self.seed(pos)
+			self.expand_again(vicinity(pos))
+
+	def expand_again(self, positions):
+		for pos in positions:
+			if pos in self.closed:
+				heappush(self.heap, (self.distances[pos], pos))
+
+	def changed(self, positions):
+		"""pos became non-free/free"""
+		roots = set()
+		for pos in positions:
+			near = vicinity(pos)
+			if self.grid.is_free(pos, static=self.static):
+				if pos in self.goals:
+					self.seed(pos)
+				self.expand_again(near)
+			else: # moves through pos and around its corners are lost
+				roots.update(p for p in (pos,) + near if p in self.distances and (p == pos or self.next_pos.get(p) in near))
+		self.invalidate(roots)
+		self.update_labels()
+
+	def close(self):
+		"""stop getting grid changes"""
+		self.grid.planners.discard(self)
+
+	def expand(self):
+		"""settle the nearest queued pos (stale entries are skipped)"""
+		d, pos = heappop(self.heap)
+		if d != self.distances.get(pos):
+			return
+		self.closed.add(pos)
+		for p, cost in self.grid.get_moves(pos, static=self.static):
+			new_d = d + cost
+			if new_d <= FlowField.max_distance and new_d < self.distances.get(p, new_d + 1):
+				self.set(p, new_d, pos)
+
+	def get_distance(self, pos):
+		"""walking distance from pos to the nearest goal or None (unreachable)"""
+		if not self.is_actual():
+			self.reset()
+		elif self.version != self.grid.static_version: # components might be relabeled
+			self.version = self.grid.static_version
+			self.update_labels()
+		if pos not in self.distances and self.grid.components.get_label(pos) not in self.labels:
+			return None
+		while self.heap and (pos not in self.distances or self.heap[0][0] < self.distances[pos]):
+			self.expand()
+		return self.distances.get(pos)
+
+	def get_chain(self, pos):
+		"""[pos, ..., goal] following the field or [];
+		non-free pos starts from its nearest reachable neighbour"""
+		if self.get_distance(pos) is None:
+			neighbours = [p for p in vicinity(pos) if self.get_distance(p) is not None]
+			if not neighbours:
+				return []
+			chain = [pos]
+			pos = min(neighbours, key=self.get_distance)
+		else:
+			chain = []
+		chain.append(pos)
+		while pos not in self.goals:
+			pos = self.next_pos[pos]
+			chain.append(pos)
+		return chain
+
+	def get_path(self, pos, end_pos, simplify=True, method='astar'):
+		"""path [pos, ..., end_pos] along the field to the goals and then to end_pos
+		(end_pos is usually one of the goals or close to them), see Grid.get_full_path"""
+		chain = self.get_chain(pos)
+		if not chain:
+			return []
+		path = self.grid.simplify_path(chain, static=self.static) if simplify else chain
+		if path[-1] != end_pos:
+			tail = self.grid.get_full_path(path[-1], end_pos, check=False, simplify=simplify, static=self.static, method=method)
+			path += tail[1:] if tail and tail[0] == path[-1] else tail
+		return path
@@ -1,18 +1,44 @@
 # Python imports
 from math import floor, ceil
 from itertools import chain
+from heapq import heappush, heappop
 # Game imports
-from core import get_angle, to_pos, to_vector, vicinity, square, dist
+from core import get_angle, to_pos, to_vector, rotated, vicinity, square, dist, octile, sqrt2
+from components import Components, ObstacleIndex
+from sight import get_samples, get_first_blocks, segments_are_free
+from path_cache import PathCache
+from hierarchy import Hierarchy
+from spatial_hash import SpatialHash
+from scheduler import PathScheduler
 
 class Grid(object):
 
 	max_path_length = 1e3
 	max_path_verticies = 1e2
+	path_methods = {'astar': 'get_astar_path', 'theta': 'get_theta_path', 'hpa': 'get_hierarchical_path', 'wave': 'get_wave_path'} # see get_full_path
+	path_iterators = {'astar': 'iter_astar_path', 'theta': 'iter_theta_path'} # resumable searches
+	search_slice = 64 # expansions between yields of resumable searches
+	hierarchical_distance = 64 # 'astar' --> 'hpa' for longer static paths (None: never)
+	bounded = False # pos out of the extent is free
+	offsets = {} # limit --> offsets ordered by distance (see get_offsets)
+	block_size = 8 # of coarse occupancy counts (see area_is_free)
 
 	def __init__(self):
 		self.list_grid = {} # dict of lists of objects on occupied pos
 		self.static_grid = {} # dict for stable objects
 		self.dynamic_grid = {} # dict for moving objects
+		self.static_blocks = {} # block --> number of static non-free pos in it
+		self.dynamic_blocks = {} # block --> number of dynamic non-free pos in it
+		self.components = Components(self) # of static walkable space
+		self.obstacles = ObstacleIndex(self) # of static non-free space
+		self.path_cache = PathCache() # of get_full_path
+		self.static_version = 0 # += 1 on every change of static objects
+		self.hierarchy = Hierarchy(self) # of clusters for long static paths
+		self.planners = set() # listeners of static changes: replanners of moving creatures (see DStarLite), distance fields (see FlowField)
+		self.path_owners = {} # pos --> set of creatures whose active path crosses it
+		self.path_cells = {} # creature --> pos of its active path (see add_path)
+		self.scheduler = PathScheduler(self) # of time-sliced path requests
+		self.units = SpatialHash() # of moving objects (for nearest/radius queries)
 
 	def __repr__(self):
 		return "Grid()"
@@ -27,143 +53,199 @@ class Grid(object):
 		else: # buildings
 			return pos not in self.static_grid
 
+	def get_block(self, pos):
+		return (pos[0]//Grid.block_size, pos[1]//Grid.block_size)
+
+	def count_block(self, blocks, pos, delta):
+		"""pos in block became non-free (+1)/free (-1)"""
+		block = self.get_block(pos)
+		count = blocks.get(block, 0) + delta
+		if count:
+			blocks[block] = count
+		else:
+			del blocks[block]
+
 	def area_is_free(self, center_pos, size=0, static=False):
 		"""check if
 		square (2*size+1)x(2*size+1)
-		with center in center_pos is free"""
+		with center in center_pos is free;
+		square within blocks without non-free pos (usually 1-4 blocks) is free at once"""
+		x, y = center_pos
+		bx0, by0 = self.get_block((x - size, y - size))
+		bx1, by1 = self.get_block((x + size, y + size))
+		blocks = [(bx, by) for bx in xrange(bx0, bx1 + 1) for by in xrange(by0, by1 + 1)]
+		if not any(b in self.static_blocks or (not static and b in self.dynamic_blocks) for b in blocks):
+			return True
 		return all(self.is_free(p, static=static) for p in square(center_pos, size))
 
+	def get_build_sites(self, size, rect, static=False):
+		"""return list of center pos in rect (min_x, min_y, max_x, max_y)
+		where area_is_free(pos, size, static)"""
+		min_x, min_y, max_x, max_y = rect
+		return [(x, y) for x in xrange(min_x, max_x + 1) for y in xrange(min_y, max_y + 1)
+			if self.area_is_free((x, y), size=size, static=static)]
+
+	def are_free(self, xs, ys, static=False):
+		"""batch is_free: xs, ys --> list of bool"""
+		return [self.is_free((x, y), static=static) for x, y in zip(xs, ys)]
+
 	def segment_is_free(self, start_pos, end_pos, static=False):
-		"""check if segment with given ends is free, borrowed from self.get_obstacles()"""
-		if start_pos == end_pos:
-			return True
-		start_x, start_y = start_pos
-		end_x, end_y = end_pos
-		dx = (start_x - end_x)
-		dy = (start_y - end_y)
-		if abs(dy) >= abs(dx):
-			k = dx/dy
-			if start_y > end_y:
-				start_x, end_x = end_x, start_x
-				start_y, end_y = end_y, start_y
-			for y in xrange(end_y - start_y + 1):
-				p1 = (int(floor(start_x + k*y)), start_y + y)
-				p2 = (int(ceil(start_x + k*y)), start_y + y)
-				if not all([self.is_free(pos, static=static) for pos in (p1, p2)]):
-					return False
-		else:
-			k = dy/dx
-			if start_x > end_x:
-				start_x, end_x = end_x, start_x
-				start_y, end_y = end_y, start_y
-			for x in xrange(end_x - start_x + 1):
-				p1 = (start_x + x, int(floor(start_y + k*x)))
-				p2 = (start_x + x, int(ceil(start_y + k*x)))
-				if not all([self.is_free(pos, static=static) for pos in (p1, p2)]):
-					return False
-		return True
+		"""check if segment with given ends is free (both floor and ceil pos along it, see sight)"""
+		return self.get_first_block(start_pos, end_pos, static=static) is None
 
 	def path_is_free(self, start_pos, end_pos, static=False):
-		"""check if path with given ends is free, borrowed from self.get_obstacles()"""
-		if start_pos == end_pos:
-			return True
-		start_x, start_y = start_pos
-		end_x, end_y = end_pos
-		dx = (start_x - end_x)
-		dy = (start_y - end_y)
-		if abs(dy) >= abs(dx):
-			k = dx/dy
-			if start_y > end_y:
-				start_x, end_x = end_x, start_x
-				start_y, end_y = end_y, start_y
-			for y in xrange(end_y - start_y + 1):
-				p1 = (int(floor(start_x + k*y)), start_y + y)
-				p2 = (int(ceil(start_x + k*y)), start_y + y)
-				if not self.is_free(p1, static=static) and not self.is_free(p2, static=static):
-					return False
-		else:
-			k = dy/dx
-			if start_x > end_x:
-				start_x, end_x = end_x, start_x
-				start_y, end_y = end_y, start_y
-			for x in xrange(end_x - start_x + 1):
-				p1 = (start_x + x, int(floor(start_y + k*x)))
-				p2 = (start_x + x, int(ceil(start_y + k*x)))
-				if not self.is_free(p1, static=static) and not self.is_free(p2, static=static):
-					return False
-		return True
+		"""check if path with given ends is free (floor or ceil pos along it, see sight)"""
+		return self.get_first_block(start_pos, end_pos, static=static, strict=False) is None
+
+	def get_first_block(self, start_pos, end_pos, static=False, strict=True):
+		"""return first (from start_pos) non-free pos on segment or None (see sight.get_first_blocks)"""
+		return get_first_blocks(self, [(start_pos, end_pos)], static=static, strict=strict)[0]
+
+	def segments_are_free(self, segments, static=False, strict=True):
+		"""batch segment_is_free (strict) / path_is_free: [(pos1, pos2), ...] --> [bool, ...]"""
+		return segments_are_free(self, segments, static=static, strict=strict)
 
 	def add(self, a):
 		"""add to **dynamic/static/list** grid"""
 		static = a.static
 		if static:
+			blocked = []
 			for p in square(a.grid_pos, a.grid_size):
 				if p in self.static_grid:
 					self.static_grid[p] += 1
 				else:
 					self.static_grid[p] = 1
+					blocked.append(p)
 				if p in self.list_grid:
 					self.list_grid[p].append(a)
 				else:
 					self.list_grid[p] = [a]
+			self.static_changed(blocked=blocked)
 		else:
 			for p in square(a.grid_pos, a.grid_size):
 				if p in self.dynamic_grid:
 					self.dynamic_grid[p] += 1
 				else:
 					self.dynamic_grid[p] = 1
+					self.count_block(self.dynamic_blocks, p, +1)
 				if p in self.list_grid:
 					self.list_grid[p].append(a)
 				else:
 					self.list_grid[p] = [a]
+			self.dynamic_changed(square(a.grid_pos, a.grid_size))
+			self.units.add(a)
 
 	def remove(self, a):
 		"""remove from **dynamic/static/list** grid"""
 		static = a.static
 		if static:
+			freed = []
 			for p in square(a.grid_pos, a.grid_size):
 				if self.static_grid[p] == 1:
 					del self.static_grid[p]
+					freed.append(p)
 				else:
 					self.static_grid[p] -= 1
 				if len(self.list_grid[p]) == 1:
 					del self.list_grid[p]
 				else:
 					self.list_grid[p].remove(a)
+			self.static_changed(freed=freed)
 		else:
 			for p in square(a.grid_pos, a.grid_size):
 				if self.dynamic_grid[p] == 1:
 					del self.dynamic_grid[p]
+					self.count_block(self.dynamic_blocks, p, -1)
 				else:
 					self.dynamic_grid[p] -= 1
 				if len(self.list_grid[p]) == 1:
 					del self.list_grid[p]
 				else:
 					self.list_grid[p].remove(a)
+			self.dynamic_changed(square(a.grid_pos, a.grid_size))
+			self.units.remove(a)
+
+	def static_changed(self, blocked=(), freed=()):
+		"""pos became non-free/free for static objects"""
+		if blocked or freed:
+			self.static_version += 1
+			for p in blocked:
+				self.count_block(self.static_blocks, p, +1)
+			for p in freed:
+				self.count_block(self.static_blocks, p, -1)
+			self.components.update(blocked=blocked, freed=freed)
+			self.obstacles.update(blocked=blocked, freed=freed)
+			self.hierarchy.update(blocked=blocked, freed=freed)
+			for planner in self.planners:
+				planner.changed(chain(blocked, freed))
+			self.path_cache.touch(chain(blocked, freed), static=True)
+			for owner in set(chain(*[self.path_owners[p] for p in blocked if p in self.path_owners])):
+				owner.path_blocked()
+
+	def add_path(self, owner, points):
+		"""owner follows path [pos, ...]: remember pos along it (floor and ceil, see sight),
+		owner.path_blocked() is called when static objects block any of them"""
+		self.remove_path(owner)
+		index, xa, ya, xb, yb = get_samples(zip(points, points[1:]) or [(points[0], points[0])])
+		cells = self.path_cells[owner] = set(zip(xa.tolist(), ya.tolist())) | set(zip(xb.tolist(), yb.tolist()))
+		for p in cells:
+			if p in self.path_owners:
+				self.path_owners[p].add(owner)
+			else:
+				self.path_owners[p] = set([owner])
+
+	def remove_path(self, owner):
+		"""owner has finished (or dropped) its path"""
+		for p in self.path_cells.pop(owner, ()):
+			if len(self.path_owners[p]) == 1:
+				del self.path_owners[p]
+			else:
+				self.path_owners[p].discard(owner)
+
+	def dynamic_changed(self, positions):
+		"""occupancy of pos by moving objects has changed"""
+		self.path_cache.touch(positions, static=False)
+
+	def in_extent(self, pos):
+		"""check if pos might be non-free not only because it's out of the grid"""
+		return True
+
+	def get_extent(self, margin=1):
+		"""(min_x, min_y, max_x, max_y) of static pos with margin or None"""
+		if not self.static_grid:
+			return None
+		xs = [p[0] for p in self.static_grid]
+		ys = [p[1] for p in self.static_grid]
+		return (min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin)
 
 	def update(self, a):
 		static = a.static
 		grid_pos = self.get_xy(a.pos)
 		if grid_pos != a.grid_pos:
 			self.remove(a)
-			self.grid_pos = grid_pos
+			a.grid_pos = grid_pos
 			self.add(a)
 
 	def get_xy(self, v):
 		"""object with obj.x and obj.y attributes --> (x, y) on the grid"""
 		return (int(round(v.x)), int(round(v.y)))
 
-	def get_obstacle(self, pos, s=None, static=False):
-		"""recursive, return set;
-		obstacle is set of adjacent non-free points"""
-		if s is None:
-			s = set()
+	def get_obstacle(self, pos, static=False):
+		"""return set;
+		obstacle is set of adjacent (4-connected) non-free points;
+		static obstacles are looked up in self.obstacles (don't modify them)"""
+		if static:
+			return self.obstacles.get_obstacle(pos)
 		if self.is_free(pos, static=static):
-			return s
-		else:
-			s.add(pos)
-			check_list = [(pos[0] - 1, pos[1]), (pos[0] + 1, pos[1]), (pos[0], pos[1] - 1), (pos[0], pos[1] + 1)]
-			return set().union(*[self.get_obstacle(pos=p, s=s) for p in check_list if p not in s])
+			return set()
+		s = set([pos])
+		stack = [pos]
+		while stack:
+			for p in vicinity(stack.pop(), small=True):
+				if p not in s and self.in_extent(p) and not self.is_free(p, static=static):
+					s.add(p)
+					stack.append(p)
+		return s
 
 	def get_obstacles(self, pos1, pos2, more=True, static=False):
 		"""return list of obstacles between the INT points"""
@@ -180,7 +262,7 @@ class Grid(object):
 				p1 = (int(floor(pos1[0] + k*y)), pos1[1] + y)
 				p2 = (int(ceil(pos1[0] + k*y)), pos1[1] + y)
 				if more:
-					points += [p for p in (p1, p2) if not self.is_free(p)]
+					points += [p for p in (p1, p2) if not self.is_free(p, static=static)]
 				elif not self.is_free(p1, static=static) and not self.is_free(p2, static=static):
 					points.append(p1)
 		else:
@@ -221,15 +303,17 @@ class Grid(object):
 			return tuple()
 		p1, p2 = x
 		if more:
-			v1 = filter(lambda p: self.is_free(p, static=static) and self.path_is_free(pos1, p, static=static), vicinity(p1))
-			v2 = filter(lambda p: self.is_free(p, static=static) and self.path_is_free(pos1, p, static=static), vicinity(p2))
-			fv1 = filter(lambda p: self.segment_is_free(pos1, p, static=static), v1)
-			if fv1:
-				v1 = fv1
-			fv2 = filter(lambda p: self.segment_is_free(pos1, p, static=static), v2)
-			if fv2:
-				v2 = fv2
-			return chain(v1, v2)
+			v1 = [p for p in vicinity(p1) if self.is_free(p, static=static)]
+			v2 = [p for p in vicinity(p2) if self.is_free(p, static=static)]
+			segments = [(pos1, p) for p in v1 + v2]
+			path_free = self.segments_are_free(segments, static=static, strict=False)
+			segment_free = self.segments_are_free(segments, static=static)
+			contacts = []
+			for vi, k in ((v1, 0), (v2, len(v1))):
+				vi = [(p, segment_free[k + j]) for j, p in enumerate(vi) if path_free[k + j]]
+				fvi = [p for p, free in vi if free]
+				contacts += fvi or [p for p, free in vi]
+			return iter(contacts)
 		else:
 			p1 = to_vector(p1) + rotated((to_vector(p1) - to_vector(pos1)).normalized(), 90)*1.45 # sqrt(2) < 1.45 < 1.5
 			p2 = to_vector(p2) - rotated((to_vector(p2) - to_vector(pos1)).normalized(), 90)*1.45 # ==> always to another grid pos
@@ -271,6 +355,126 @@ class Grid(object):
 				return []
 		return list(reversed(path))
 
+	def get_moves(self, pos, static=False):
+		"""(x, y) --> ((pos, cost), ...) of 8-connected moves (see vicinity);
+		diagonal moves don't cut corners of static cells"""
+		x, y = pos
+		moves = []
+		for p in vicinity(pos):
+			if not self.is_free(p, static=static):
+				continue
+			if p[0] != x and p[1] != y:
+				if self.is_free((p[0], y), static=True) and self.is_free((x, p[1]), static=True):
+					moves.append((p, sqrt2))
+			else:
+				moves.append((p, 1))
+		return moves
+
+	def get_astar_path(self, pos1, pos2, static=False):
+		"""Calculate shortest path with A* algorithm (octile heuristic),
+		return [pos1, ..., pos2] or [] (like get_wave_path)"""
+		for path in self.iter_astar_path(pos1, pos2, static=static):
+			pass
+		return path
+
+	def iter_astar_path(self, pos1, pos2, static=False):
+		"""get_astar_path as generator: yields None after every Grid.search_slice expansions
+		(so the search may be resumed later, see PathScheduler), the path at the end"""
+		if pos1 == pos2:
+			yield [pos2]
+			return
+		if not self.is_free(pos2, static=static):
+			yield []
+			return
+		g = {pos1: 0}
+		came_from = {pos1: None}
+		closed = set()
+		h = octile(pos1, pos2)
+		heap = [(h, h, pos1)]
+		while heap:
+			f, h, pos = heappop(heap)
+			if pos == pos2:
+				path = [pos2]
+				while came_from[path[-1]] is not None:
+					path.append(came_from[path[-1]])
+				yield list(reversed(path))
+				return
+			if pos in closed:
+				continue
+			closed.add(pos)
+			if len(closed) % Grid.search_slice == 0:
+				yield None
+			for p, cost in self.get_moves(pos, static=static):
+				new_g = g[pos] + cost
+				if new_g <= Grid.max_path_length and new_g < g.get(p, new_g + 1):
+					g[p] = new_g
+					came_from[p] = pos
+					h = octile(p, pos2)
+					heappush(heap, (new_g + h, h, p))
+		yield []
+
+	def get_theta_path(self, pos1, pos2, static=False):
+		"""Calculate any-angle path with Theta* algorithm
+		(A* where a pos may get parent of its parent if the segment between them is free),
+		return [pos1, ..., pos2] of straight-line verticies or []"""
+		for path in self.iter_theta_path(pos1, pos2, static=static):
+			pass
+		return path
+
+	def iter_theta_path(self, pos1, pos2, static=False):
+		"""get_theta_path as generator (see iter_astar_path)"""
+		if pos1 == pos2:
+			yield [pos2]
+			return
+		if not self.is_free(pos2, static=static):
+			yield []
+			return
+		g = {pos1: 0}
+		came_from = {pos1: None}
+		closed = set()
+		h = dist(pos1, pos2)
+		heap = [(h, h, pos1)]
+		while heap:
+			f, h, pos = heappop(heap)
+			if pos == pos2:
+				path = [pos2]
+				while came_from[path[-1]] is not None:
+					path.append(came_from[path[-1]])
+				yield list(reversed(path))
+				return
+			if pos in closed:
+				continue
+			closed.add(pos)
+			if len(closed) % Grid.search_slice == 0:
+				yield None
+			parent = came_from[pos]
+			moves = [(p, cost) for p, cost in self.get_moves(pos, static=static) if p not in closed]
+			if parent is not None and moves:
+				visible = self.segments_are_free([(parent, p) for p, cost in moves], static=static)
+			else:
+				visible = [False]*len(moves)
+			for (p, cost), v in zip(moves, visible):
+				if v:
+					new_g, new_parent = g[parent] + dist(parent, p), parent
+				else:
+					new_g, new_parent = g[pos] + cost, pos
+				if new_g <= Grid.max_path_length and new_g < g.get(p, new_g + 1):
+					g[p] = new_g
+					came_from[p] = new_parent
+					h = dist(p, pos2)
+					heappush(heap, (new_g + h, h, p))
+		yield []
+
+	def get_hierarchical_path(self, pos1, pos2, static=True):
+		"""Calculate path with HPA* (see Hierarchy) over static objects,
+		falls back to A* within one cluster or for not static"""
+		path = None
+		if static and self.is_free(pos2, static=static):
+			path = self.hierarchy.get_path(pos1, pos2)
+		if path is None:
+			path = self.get_astar_path(pos1, pos2, static=static)
+		return path
+
 	def __get_dual_wave_path(self, pos1, pos2, bounds=False, static=False):
 		"""Calculate shortest path with Wave (Lee) algorithm (dual wave)"""
 		# TODO: ADD bounds search
@@ -326,27 +530,92 @@ class Grid(object):
 				return []
 		return path
 
-	def get_full_path(self, pos1, pos2, check=True, simplify=True, static=False):
-		if self.path_is_free(pos1, pos2, static=static):
-			path = [pos2]
-		else:
-			path = self.get_wave_path(pos1, pos2, bounds=False, static=static)
+	def get_full_path(self, pos1, pos2, check=True, simplify=True, static=False, method='astar'):
+		"""method: 'astar', 'theta' (any-angle), 'hpa' (hierarchical)
+		or 'wave' (reference implementation), see Grid.path_methods;
+		'astar' becomes 'hpa' for static paths longer than Grid.hierarchical_distance"""
+		for path in self.iter_full_path(pos1, pos2, check=check, simplify=simplify, static=static, method=method):
+			pass
+		return path
+
+	def iter_full_path(self, pos1, pos2, check=True, simplify=True, static=False, method='astar'):
+		"""get_full_path as generator: yields None while searching, the path at the end;
+		'astar' and 'theta' searches are resumable (see Grid.path_iterators), others run at once;
+		resumed search is started again if static objects have changed meanwhile
+		(its path might cross them and must not be cached with new versions of chunks)"""
+		key = (pos1, pos2, static, method, simplify)
+		version = None
+		while version != self.static_version:
+			version = self.static_version
+			if not self.components.are_connected(pos1, pos2):
+				yield []
+				return
+			path = self.path_cache.get(key, static=static)
+			if path is not None:
+				yield path
+				return
+			if self.path_is_free(pos1, pos2, static=static):
+				path = [pos2]
+				break
+			search_method = method
+			if method == 'astar' and static and Grid.hierarchical_distance is not None and octile(pos1, pos2) > Grid.hierarchical_distance:
+				search_method = 'hpa'
+			if search_method in Grid.path_iterators:
+				for path in getattr(self, Grid.path_iterators[search_method])(pos1, pos2, static=static):
+					if path is None:
+						yield None
+			else:
+				path = getattr(self, Grid.path_methods[search_method])(pos1, pos2, static=static)
 			# path, length = self.get_path(pos1, pos2, static=static)
 		if path:
 			if check:
-				for i in xrange(len(path) - 1):
-					if not self.path_is_free(path[i], path[i + 1], static=static):
-						print "-broken chain: {} --> {}".format(path[i], path[i + 1])
-					if not self.segment_is_free(path[i], path[i + 1], static=static):
-						print "!weak chain: {} --> {}".format(path[i], path[i + 1])
+				segments = zip(path, path[1:])
+				path_free = self.segments_are_free(segments, static=static, strict=False)
+				segment_free = self.segments_are_free(segments, static=static)
+				for (p1, p2), p_free, s_free in zip(segments, path_free, segment_free):
+					if not p_free:
+						print "-broken chain: {} --> {}".format(p1, p2)
+					if not s_free:
+						print "!weak chain: {} --> {}".format(p1, p2)
 			if simplify:
-				j = 0
-				for i in xrange(len(path) - 2):
-					if self.segment_is_free(path[i-j], path[i-j+2], static=static):
-						del path[i-j+1]
-						j += 1
-		return path
+				path = self.simplify_path(path, static=static)
+			self.path_cache.add(key, pos1, path, static=static)
+		yield path
 
-	def get_near_free(self, pos, limit=5, static=False):
+	def simplify_path(self, path, static=False):
+		"""keep only verticies of the path needed to see (segment_is_free) the next one:
+		from every kept vertex jump to the furthest visible one (batch check)"""
+		simple = path[:1]
+		i = 0
+		while i < len(path) - 2:
+			free = self.segments_are_free([(path[i], p) for p in path[i + 2:]], static=static)
+			visible = [j for j, f in enumerate(free) if f]
+			i += 2 + visible[-1] if visible else 1
+			simple.append(path[i])
+		if i == len(path) - 2:
+			simple.append(path[-1])
+		return simple
+
+	def get_offsets(self, limit):
+		"""offsets of square(limit) ordered by distance (square order among equal ones)"""
+		if limit not in Grid.offsets:
+			Grid.offsets[limit] = sorted(square((0, 0), limit), key=lambda p: dist((0, 0), p))
+		return Grid.offsets[limit]
+
+	def get_near_frees(self, pos, n, limit=5, static=False):
+		"""[free pos, ...]: up to n nearest to pos in square(pos, limit) (batch get_near_free)"""
 		x0, y0 = pos
-		return min((p for p in square(pos, limit) if self.is_free(p, static=static)), key=lambda p: dist(pos, p))
\ No newline at end of file
+		frees = []
+		for dx, dy in self.get_offsets(limit):
+			p = (x0 + dx, y0 + dy)
+			if self.is_free(p, static=static):
+				frees.append(p)
+				if len(frees) == n:
+					break
+		return frees
+
+	def get_near_free(self, pos, limit=5, static=False):
+		"""nearest to pos free pos in square(pos, limit) or None;
+		rings around pos are checked from inside, the search stops at the first free pos"""
+		frees = self.get_near_frees(pos, 1, limit=limit, static=static)
+		return frees[0] if frees else None
@@ -0,0 +1,194 @@
+# Python imports
+from heapq import heappush, heappop
+# Game imports
+from core import octile, sign
+
+class Hierarchy(object):
+	"""hierarchical pathfinding (HPA*) over static objects:
+	grid is split into clusters (cluster_size x cluster_size pos),
+	nodes of the abstract graph are transitions on cluster borders,
+	intra-cluster distances (and Dijkstra trees for refinement) are cached;
+	static changes make dirty only their cluster and its neighbours,
+	dirty clusters are rebuilt lazily"""
+
+	cluster_size = 16
+	max_entrance_width = 5 # wider entrances get 2 transitions (at their ends)
+	max_path_length = 1e3
+
+	def __init__(self, grid):
+		self.grid = grid
+		self.counts = {} # cluster --> number of static pos
+		self.borders = {} # (cluster, cluster) --> [(pos, pos), ...] transitions
+		self.edges = {} # cluster --> {node: {node: distance}}
+		self.trees = {} # cluster --> {node: parents (None in empty cluster)}
+		self.links = {} # cluster --> {node: [node in neighbour cluster, ...]}
+		self.dirty = set()
+
+	def __repr__(self):
+		return "Hierarchy({})".format(self.grid)
+
+	def __str__(self):
+		return "<Hierarchy of {} clusters>".format(len(self.edges))
+
+	def get_cluster(self, pos):
+		return (pos[0]//Hierarchy.cluster_size, pos[1]//Hierarchy.cluster_size)
+
+	def get_neighbours(self, cluster):
+		cx, cy = cluster
+		return ((cx + 1, cy), (cx, cy - 1), (cx - 1, cy), (cx, cy + 1))
+
+	def update(self, blocked=(), freed=()):
+		"""pos became non-free/free for static objects"""
+		changed = set()
+		for pos, dcount in [(p, +1) for p in blocked] + [(p, -1) for p in freed]:
+			cluster = self.get_cluster(pos)
+			self.counts[cluster] = self.counts.get(cluster, 0) + dcount
+			changed.add(cluster)
+		for cluster in changed:
+			self.dirty.add(cluster)
+			for neighbour in self.get_neighbours(cluster):
+				self.borders.pop((min(cluster, neighbour), max(cluster, neighbour)), None)
+				self.dirty.add(neighbour)
+
+	def get_border(self, c1, c2):
+		"""transitions [(pos in c1, pos in c2), ...] between 4-adjacent clusters"""
+		key = (min(c1, c2), max(c1, c2))
+		if key not in self.borders:
+			self.borders[key] = self.find_transitions(*key)
+		if key[0] == c1:
+			return self.borders[key]
+		return [(b, a) for a, b in self.borders[key]]
+
+	def find_transitions(self, c1, c2):
+		"""c2 is the right or the upper neighbour of c1"""
+		size = Hierarchy.cluster_size
+		if c2[0] == c1[0] + 1: # vertical border
+			x = c2[0]*size
+			pairs = [((x - 1, y), (x, y)) for y in xrange(c1[1]*size, (c1[1] + 1)*size)]
+		else: # horizontal border
+			y = c2[1]*size
+			pairs = [((x, y - 1), (x, y)) for x in xrange(c1[0]*size, (c1[0] + 1)*size)]
+		transitions = []
+		run = [] # entrance
+		for pair in pairs + [None]:
+			if pair is not None and self.grid.is_free(pair[0], static=True) and self.grid.is_free(pair[1], static=True):
+				run.append(pair)
+			elif run:
+				if len(run) <= Hierarchy.max_entrance_width:
+					transitions.append(run[len(run)//2])
+				else:
+					transitions += [run[0], run[-1]]
+				run = []
+		return transitions
+
+	def search(self, source, cluster):
+		"""Dijkstra from source inside cluster --> (distances, parents);
+		parents is None in empty cluster, distances are octile there"""
+		if self.counts.get(cluster, 0) == 0:
+			return None, None
+		distances = {source: 0}
+		parents = {source: None}
+		closed = set()
+		heap = [(0, source)]
+		while heap:
+			d, pos = heappop(heap)
+			if pos in closed:
+				continue
+			closed.add(pos)
+			for p, cost in self.grid.get_moves(pos, static=True):
+				if d + cost < distances.get(p, d + cost + 1) and self.get_cluster(p) == cluster:
+					distances[p] = d + cost
+					parents[p] = pos
+					heappush(heap, (d + cost, p))
+		return distances, parents
+
+	def get_distances(self, source, nodes, distances):
+		"""{node: distance} of reached nodes (see search)"""
+		if distances is None:
+			return {node: octile(source, node) for node in nodes if node != source}
+		return {node: distances[node] for node in nodes if node != source and node in distances}
+
+	def get_edges(self, cluster):
+		"""{node: {node: distance}} of the cluster (rebuilt if dirty)"""
+		if cluster in self.dirty or cluster not in self.edges:
+			links = {}
+			for neighbour in self.get_neighbours(cluster):
+				for a, b in self.get_border(cluster, neighbour):
+					links.setdefault(a, []).append(b)
+			edges = {}
+			trees = {}
+			for node in links:
+				distances, trees[node] = self.search(node, cluster)
+				edges[node] = self.get_distances(node, links, distances)
+			self.edges[cluster] = edges
+			self.trees[cluster] = trees
+			self.links[cluster] = links
+			self.dirty.discard(cluster)
+		return self.edges[cluster]
+
+	def get_leg(self, tree, pos1, pos2):
+		"""[..., pos2] from pos1 (excluded) along Dijkstra tree from pos1 (or straight in empty cluster)"""
+		if tree is None:
+			leg = []
+			x, y = pos1
+			while (x, y) != pos2:
+				x += sign(pos2[0] - x)
+				y += sign(pos2[1] - y)
+				leg.append((x, y))
+			return leg
+		leg = [pos2]
+		while tree[leg[-1]] != pos1:
+			leg.append(tree[leg[-1]])
+		return list(reversed(leg))
+
+	def get_path(self, pos1, pos2):
+		"""return [pos1, ..., pos2], [] (no way)
+		or None (the same cluster, use flat search)"""
+		c1, c2 = self.get_cluster(pos1), self.get_cluster(pos2)
+		if c1 == c2:
+			return None
+		start_distances, start_tree = self.search(pos1, c1)
+		goal_distances, goal_tree = self.search(pos2, c2)
+		start_nodes = self.get_distances(pos1, self.get_edges(c1), start_distances)
+		goal_nodes = self.get_distances(pos2, self.get_edges(c2), goal_distances)
+		g = {pos1: 0}
+		came_from = {pos1: None}
+		closed = set()
+		heap = [(octile(pos1, pos2), pos1)]
+		while heap:
+			f, node = heappop(heap)
+			if node == pos2:
+				break
+			if node in closed:
+				continue
+			closed.add(node)
+			if node == pos1: # pos1 might be a transition itself
+				neighbours = start_nodes.items() + [(p, 1) for p in self.links[c1].get(pos1, ())]
+			else:
+				cluster = self.get_cluster(node)
+				neighbours = self.get_edges(cluster)[node].items() + [(p, 1) for p in self.links[cluster][node]]
+				if node in goal_nodes:
+					neighbours.append((pos2, goal_nodes[node]))
+			for p, cost in neighbours:
+				new_g = g[node] + cost
+				if new_g <= Hierarchy.max_path_length and new_g < g.get(p, new_g + 1):
+					g[p] = new_g
+					came_from[p] = node
+					heappush(heap, (new_g + octile(p, pos2), p))
+		else:
+			return []
+		abstract_path = [pos2]
+		while came_from[abstract_path[-1]] is not None:
+			abstract_path.append(came_from[abstract_path[-1]])
+		abstract_path.reverse()
+		path = [pos1] # refinement
+		for a, b in zip(abstract_path, abstract_path[1:]):
+			if self.get_cluster(a) != self.get_cluster(b): # transition (pos1 or pos2 might be one)
+				path.append(b)
+			elif a == pos1:
+				path += self.get_leg(start_tree, a, b)
+			elif b == pos2:
+				path += reversed([pos2] + self.get_leg(goal_tree, b, a)[:-1])
+			else:
+				path += self.get_leg(self.trees[self.get_cluster(a)][a], a, b)
+		return path
@@ -3,6 +3,8 @@
 from panda3d.core import LPoint3 as Point
 # Game imports
 from grid import Grid
+from array_grid import ArrayGrid
+from workers import PathWorkers
 from flag import Flag
 from unit import Unit
 
@@ -12,22 +14,28 @@ model_paths = {
 
 class Map(Unit):
 	"""map contains towns, obstacles and grid;
-	map is single"""
-	def __init__(self, kind, render, loader, pos=None):
+	map is single;
+	extent = (min_x, min_y, max_x, max_y) ==> array-backed grid (see ArrayGrid);
+	processes ==> static paths are searched in worker processes (see PathWorkers)"""
+	def __init__(self, kind, render, loader, pos=None, extent=None, processes=None):
 		self.pos = pos or Point(0, 0, 0)
 		self.render = render
 		self.loader = loader
 		Unit.__init__(self, kind=kind, pos=self.pos, model=self.loader.loadModel(model_paths[kind]))
 		self.model.reparent_to(self.render)
 		self.model.find("**/Grid").node().set_python_tag('host', Map)
-		self.grid = Grid()
+		self.extent = extent
+		self.grid = Grid() if extent is None else ArrayGrid(extent)
+		self.processes = processes
+		if processes:
+			self.grid.scheduler = PathWorkers(self.grid, processes)
 		self.towns = {flag: [] for flag in Flag.flags.values()}
 		self.obstacles = []
 
 		Map.map = self
 
 	def __repr__(self):
-		return "Map({}, {}, {}, {})".format(self.kind, self.render, self.loader, self.pos)
+		return "Map({}, {}, {}, {}, {}, {})".format(self.kind, self.render, self.loader, self.pos, self.extent, self.processes)
 
 	def __str__(self):
 		return "<Game map at {}>".format(self.pos)
@@ -36,6 +44,7 @@ class Map(Unit):
 		for flag in self.towns:
 			for town in self.towns[flag]:
 				town.update(dt=dt)
+		self.grid.scheduler.update()
 
 	def add_town(self, town):
 		self.towns[town.flag].append(town)
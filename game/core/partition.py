@@ -0,0 +1,46 @@
+# Game imports
+from flow_field import FlowField
+
+class Partition(FlowField):
+	"""listening FlowField which also tells the nearest goal of every reached pos
+	(Voronoi cells by walking distance); goals are added and removed in place:
+	a new goal takes the pos which get nearer to it as it's expanded,
+	pos of removed goal are forgotten and reached again from their border"""
+
+	def __init__(self, grid, goals, static=True):
+		FlowField.__init__(self, grid, goals, static=static, listening=True)
+
+	def __repr__(self):
+		return "Partition({}, {}, {})".format(self.grid, self.goals, self.static)
+
+	def __str__(self):
+		return "<Partition of {} pos between {} goals>".format(len(self.sources), len(self.goals))
+
+	def reset(self):
+		self.sources = {} # pos --> the nearest goal
+		FlowField.reset(self)
+
+	def set(self, pos, d, next_pos):
+		self.sources[pos] = pos if next_pos is None else self.sources[next_pos]
+		FlowField.set(self, pos, d, next_pos)
+
+	def forget(self, pos):
+		del self.sources[pos]
+		FlowField.forget(self, pos)
+
+	def add_goal(self, goal):
+		self.goals.add(goal)
+		self.seed(goal)
+		self.update_labels()
+
+	def remove_goal(self, goal):
+		self.goals.discard(goal)
+		if goal in self.distances:
+			self.invalidate([goal])
+		self.update_labels()
+
+	def get_goal(self, pos):
+		"""the nearest by walk goal from pos or None (unreachable)"""
+		if pos is None or self.get_distance(pos) is None:
+			return None
+		return self.sources[pos]
@@ -0,0 +1,90 @@
+# Python imports
+from collections import OrderedDict
+from itertools import chain
+# Game imports
+from sight import get_samples
+
+class PathCache(object):
+	"""LRU cache of paths {key: path} with bounded total number of verticies;
+	grid is split into chunks (chunk_size x chunk_size pos) with versions,
+	entry remembers versions of chunks its path crosses
+	and becomes invalid when any of them changes (see Grid.static_changed)"""
+
+	chunk_size = 16
+	capacity = 4096 # verticies
+
+	def __init__(self, capacity=None):
+		self.capacity = capacity or PathCache.capacity
+		self.entries = OrderedDict() # key --> (path, {chunk: version}) from least to most recently used
+		self.static_versions = {} # chunk --> version
+		self.dynamic_versions = {} # chunk --> version
+		self.size = 0 # stored verticies
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.invalidations = 0
+
+	def __repr__(self):
+		return "PathCache({})".format(self.capacity)
+
+	def __str__(self):
+		return "<PathCache of {} paths ({}/{} verticies)>".format(len(self.entries), self.size, self.capacity)
+
+	def get_chunk(self, pos):
+		return (pos[0]//PathCache.chunk_size, pos[1]//PathCache.chunk_size)
+
+	def get_version(self, chunk, static=True):
+		if static:
+			return self.static_versions.get(chunk, 0)
+		return (self.static_versions.get(chunk, 0), self.dynamic_versions.get(chunk, 0))
+
+	def touch(self, positions, static=True):
+		"""occupancy of positions has changed"""
+		versions = self.static_versions if static else self.dynamic_versions
+		for chunk in set(self.get_chunk(p) for p in positions):
+			versions[chunk] = versions.get(chunk, 0) + 1
+
+	def get(self, key, static=True):
+		"""return copy of the path or None"""
+		entry = self.entries.pop(key, None)
+		if entry is None:
+			self.misses += 1
+			return None
+		path, versions = entry
+		if any(self.get_version(chunk, static=static) != version for chunk, version in versions.items()):
+			self.size -= len(path)
+			self.invalidations += 1
+			self.misses += 1
+			return None
+		self.entries[key] = entry # most recently used
+		self.hits += 1
+		return list(path)
+
+	def add(self, key, start_pos, path, static=True):
+		"""remember path (from start_pos) under key"""
+		if len(path) > self.capacity:
+			return
+		if key in self.entries:
+			self.size -= len(self.entries.pop(key)[0])
+		points = [start_pos] + path
+		index, xa, ya, xb, yb = get_samples(zip(points, points[1:]) or [(start_pos, start_pos)])
+		chunks = set(self.get_chunk(p) for p in chain(zip(xa, ya), zip(xb, yb)))
+		self.entries[key] = (list(path), {chunk: self.get_version(chunk, static=static) for chunk in chunks})
+		self.size += len(path)
+		while self.size > self.capacity:
+			self.size -= len(self.entries.popitem(last=False)[1][0])
+			self.evictions += 1
+
+	def clear(self):
+		self.entries.clear()
+		self.size = 0
+
+	def get_stats(self):
+		"""counters for statistics"""
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'invalidations': self.invalidations,
+			'paths': len(self.entries),
+			'verticies': self.size}
@@ -0,0 +1,114 @@
+# Python imports
+from heapq import heappush, heappop
+# Game imports
+from flow_field import FlowField
+
+class Reservations(object):
+	"""space-time reservation table of a town for cooperative pathfinding (WHCA*):
+	time is split into ticks (a move to a neighbour pos or a wait takes one tick),
+	a unit plans window ticks ahead avoiding (pos, tick) reserved by others
+	and head-on swaps, then reserves its own (pos, tick);
+	the rest of the path follows the flow field to the goal (true distance heuristic),
+	units re-plan the window when half of it is walked"""
+
+	window = 16 # ticks
+	step = 1.0 # s per tick
+	max_expansions = 1e4 # ==> no cooperative path
+	max_fields = 64 # cached flow fields (by goal)
+
+	def __init__(self, grid):
+		self.grid = grid
+		self.time = 0.0
+		self.cells = {} # (pos, tick) --> owner
+		self.owned = {} # owner --> [(pos, tick), ...]
+		self.fields = {} # goal pos --> FlowField
+
+	def __repr__(self):
+		return "Reservations({})".format(self.grid)
+
+	def __str__(self):
+		return "<Reservations of {} units at tick {}>".format(len(self.owned), self.get_tick())
+
+	def update(self, dt=1):
+		self.time += dt
+
+	def get_tick(self):
+		return int(self.time//Reservations.step)
+
+	def is_reserved(self, pos, tick, owner):
+		"""check if (pos, tick) is reserved by someone else"""
+		other = self.cells.get((pos, tick))
+		return other is not None and other is not owner
+
+	def reserve(self, owner, cells):
+		"""replace reservations of owner with cells [(pos, tick), ...]"""
+		self.release(owner)
+		for cell in cells:
+			self.cells[cell] = owner
+		self.owned[owner] = cells
+
+	def release(self, owner):
+		for cell in self.owned.pop(owner, ()):
+			if self.cells.get(cell) is owner:
+				del self.cells[cell]
+
+	def get_field(self, goal):
+		if goal not in self.fields:
+			if len(self.fields) >= Reservations.max_fields:
+				self.fields.clear()
+			self.fields[goal] = FlowField(self.grid, [goal], static=True)
+		return self.fields[goal]
+
+	def get_path(self, owner, pos1, pos2):
+		"""return (path, n): path [pos1, ..., pos2] (first n moves after pos1 take one tick each
+		and are reserved for owner, the rest is simplified) or ([], 0) (no way);
+		None: the window search is too big (use usual path)"""
+		field = self.get_field(pos2)
+		h = field.get_distance(pos1)
+		if h is None:
+			return [], 0
+		t0 = self.get_tick()
+		g = {(pos1, t0): 0}
+		came_from = {(pos1, t0): None}
+		closed = set()
+		heap = [(h, (pos1, t0))]
+		while heap:
+			f, node = heappop(heap)
+			pos, t = node
+			if t == t0 + Reservations.window or pos == pos2:
+				break
+			if node in closed:
+				continue
+			closed.add(node)
+			if len(closed) > Reservations.max_expansions:
+				return None
+			for p, cost in self.grid.get_moves(pos, static=True) + [(pos, 1)]:
+				next_node = (p, t + 1)
+				if self.is_reserved(p, t + 1, owner):
+					continue
+				other = self.cells.get((p, t))
+				if other is not None and other is not owner and self.cells.get((pos, t + 1)) is other:
+					continue # head-on swap
+				if t == t0 and p != pos1 and not self.grid.is_free(p):
+					continue # occupied now
+				h = field.get_distance(p)
+				new_g = g[node] + cost
+				if h is not None and new_g < g.get(next_node, new_g + 1):
+					g[next_node] = new_g
+					came_from[next_node] = node
+					heappush(heap, (new_g + h, next_node))
+		else:
+			return [], 0
+		window = [node]
+		while came_from[window[-1]] is not None:
+			window.append(came_from[window[-1]])
+		window.reverse()
+		end_pos, end_tick = node
+		cells = window + [(p, tick + 1) for p, tick in window] # one tick of slack
+		if end_pos == pos2: # stay there till the end of the window
+			cells += [(pos2, tick) for tick in xrange(end_tick + 2, t0 + Reservations.window + 1)]
+		self.reserve(owner, cells)
+		path = [p for p, tick in window]
+		if end_pos != pos2:
+			path += self.grid.simplify_path(field.get_chain(end_pos), static=True)[1:]
+		return path, len(window) - 1
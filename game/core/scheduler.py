@@ -0,0 +1,96 @@
+# Python imports
+from time import time
+from collections import deque
+
+class PathRequest(object):
+	"""path search of owner (resumable, see Grid.iter_full_path);
+	owner.path_found(path) is called when it's done"""
+
+	def __init__(self, owner, search):
+		self.owner = owner
+		self.search = search
+		self.time = time() # of the request
+		self.cancelled = False
+
+	def __repr__(self):
+		return "PathRequest({}, {})".format(self.owner, self.search)
+
+	def __str__(self):
+		return "<PathRequest of {}>".format(self.owner)
+
+class PathScheduler(object):
+	"""queue of path requests served in update (once per frame)
+	until budget (ms) is spent: the first search is resumed step by step
+	and may continue on next frames, the next one starts when it's done"""
+
+	budget = 2.0 # ms per frame
+	max_latencies = 1000 # remembered for statistics
+
+	def __init__(self, grid, budget=None):
+		self.grid = grid
+		self.budget = budget or PathScheduler.budget
+		self.queue = deque()
+		self.requests = {} # owner --> not cancelled request
+		self.latencies = deque(maxlen=PathScheduler.max_latencies) # ms from request to path
+		self.served = 0
+		self.max_depth = 0
+
+	def __repr__(self):
+		return "PathScheduler({}, {})".format(self.grid, self.budget)
+
+	def __str__(self):
+		return "<PathScheduler of {} requests ({} ms per frame)>".format(len(self.requests), self.budget)
+
+	def request(self, owner, pos1, pos2, static=False, method='astar'):
+		"""queue search of path from pos1 to pos2 (see Grid.get_full_path), replaces owner's request"""
+		return self.add(owner, self.grid.iter_full_path(pos1, pos2, static=static, method=method))
+
+	def add(self, owner, search):
+		"""queue resumable search (yields None while searching, the path at the end, see DStarLite.iter_path),
+		replaces owner's request"""
+		self.cancel(owner)
+		request = self.requests[owner] = PathRequest(owner, search)
+		self.queue.append(request)
+		self.max_depth = max(self.max_depth, len(self.requests))
+		return request
+
+	def cancel(self, owner):
+		request = self.requests.pop(owner, None)
+		if request is not None:
+			request.cancelled = True
+
+	def has_request(self, owner):
+		return owner in self.requests
+
+	def update(self):
+		"""resume searches until the budget is spent"""
+		start = time()
+		while self.queue and (time() - start)*1000 < self.budget:
+			request = self.queue[0]
+			if request.cancelled:
+				self.queue.popleft()
+				continue
+			path = next(request.search)
+			if path is not None:
+				self.queue.popleft()
+				del self.requests[request.owner]
+				self.latencies.append((time() - request.time)*1000)
+				self.served += 1
+				request.owner.path_found(path)
+
+	def get_percentile(self, q):
+		"""latency (ms) percentile of the last served requests or None"""
+		if not self.latencies:
+			return None
+		latencies = sorted(self.latencies)
+		return latencies[min(int(q*len(latencies)/100.), len(latencies) - 1)]
+
+	def get_stats(self):
+		"""counters for statistics"""
+		return {
+			'depth': len(self.requests),
+			'max_depth': self.max_depth,
+			'served': self.served,
+			'p50': self.get_percentile(50),
+			'p90': self.get_percentile(90),
+			'p99': self.get_percentile(99)}
@@ -0,0 +1,44 @@
+# Python imports
+from __future__ import division
+from numpy import array, arange, repeat, cumsum, maximum, floor, ceil, asarray, nonzero, unique
+
+def get_samples(segments):
+	"""[((x1, y1), (x2, y2)), ...] --> (index, xa, ya, xb, yb) int arrays:
+	one sample per step along the main axis of every segment (index is number of the segment),
+	(xa, ya) and (xb, yb) are floor and ceil pos of the other coordinate"""
+	segments = array(segments, dtype=float).reshape(-1, 4)
+	x0, y0, x1, y1 = segments.T
+	dx, dy = x1 - x0, y1 - y0
+	n = maximum(abs(dx), abs(dy)).astype(int) + 1 # samples per segment
+	index = repeat(arange(len(n)), n)
+	t = arange(n.sum()) - repeat(cumsum(n) - n, n) # step number in the segment
+	steps = maximum(n - 1, 1)[index]
+	x = x0[index] + (dx[index]*t)/steps
+	y = y0[index] + (dy[index]*t)/steps
+	return index, floor(x).astype(int), floor(y).astype(int), ceil(x).astype(int), ceil(y).astype(int)
+
+def get_first_blocks(grid, segments, static=False, strict=True):
+	"""[(pos1, pos2), ...] --> [first (from pos1) non-free pos on the segment or None, ...];
+	strict: both floor and ceil pos are to be free (like Grid.segment_is_free)
+	else any of them (like Grid.path_is_free)"""
+	if not segments:
+		return []
+	index, xa, ya, xb, yb = get_samples(segments)
+	free_a = asarray(grid.are_free(xa, ya, static=static), dtype=bool)
+	free_b = asarray(grid.are_free(xb, yb, static=static), dtype=bool)
+	blocked = ~(free_a & free_b) if strict else ~(free_a | free_b)
+	ends = array(segments).reshape(-1, 4)
+	blocked &= ~((ends[:, 0] == ends[:, 2]) & (ends[:, 1] == ends[:, 3]))[index] # pos1 == pos2 ==> free
+	blocks = [None]*len(segments)
+	samples = nonzero(blocked)[0]
+	segment_numbers, first = unique(index[samples], return_index=True)
+	for i, k in zip(segment_numbers, samples[first]):
+		if not free_a[k]:
+			blocks[i] = (int(xa[k]), int(ya[k]))
+		else:
+			blocks[i] = (int(xb[k]), int(yb[k]))
+	return blocks
+
+def segments_are_free(grid, segments, static=False, strict=True):
+	"""[(pos1, pos2), ...] --> [bool, ...] (see get_first_blocks)"""
+	return [block is None for block in get_first_blocks(grid, segments, static=static, strict=strict)]
@@ -0,0 +1,95 @@
+# Python imports
+from math import floor
+
+class SpatialHash(object):
+	"""uniform grid of buckets (cell_size x cell_size pos) of moving units:
+	units are bucketed by grid_pos (kept by Grid.add/remove, so Creature.update_pos moves them),
+	distances in queries are to unit.pos;
+	queries are filtered by flag, kind and condition (function unit --> bool)"""
+
+	cell_size = 8
+
+	def __init__(self, cell_size=None):
+		self.cell_size = cell_size or SpatialHash.cell_size
+		self.buckets = {} # cell --> set of units
+		self.cells = {} # unit --> cell
+
+	def __repr__(self):
+		return "SpatialHash({})".format(self.cell_size)
+
+	def __str__(self):
+		return "<SpatialHash of {} units in {} cells>".format(len(self.cells), len(self.buckets))
+
+	def __contains__(self, unit):
+		return unit in self.cells
+
+	def __len__(self):
+		return len(self.cells)
+
+	def get_cell(self, x, y):
+		return (int(floor(x/self.cell_size)), int(floor(y/self.cell_size)))
+
+	def add(self, unit):
+		cell = self.get_cell(*unit.grid_pos)
+		if self.cells.get(unit) == cell:
+			return
+		self.remove(unit)
+		self.cells[unit] = cell
+		if cell in self.buckets:
+			self.buckets[cell].add(unit)
+		else:
+			self.buckets[cell] = set([unit])
+
+	def remove(self, unit):
+		cell = self.cells.pop(unit, None)
+		if cell is not None:
+			if len(self.buckets[cell]) == 1:
+				del self.buckets[cell]
+			else:
+				self.buckets[cell].discard(unit)
+
+	def select(self, units, flag=None, kind=None, condition=None):
+		return [x for x in units
+			if (flag is None or x.flag == flag) and (kind is None or x.kind == kind) and (condition is None or condition(x))]
+
+	def get_ring(self, cell, r):
+		"""cells on the border of square (2*r+1)x(2*r+1) around cell"""
+		cx, cy = cell
+		if r == 0:
+			return [cell]
+		return ([(cx + dx, cy + dy) for dx in xrange(-r, r + 1) for dy in (-r, r)]
+			+ [(cx + dx, cy + dy) for dx in (-r, r) for dy in xrange(-r + 1, r)])
+
+	def get_nearest(self, pos, k=1, flag=None, kind=None, condition=None):
+		"""[unit, ...]: up to k nearest to pos (Point) units passing the filters;
+		rings of cells around pos are checked until nearer units can't be found"""
+		cell = self.get_cell(pos.x, pos.y)
+		found = [] # (distance, unit)
+		seen = 0
+		r = 0
+		while seen < len(self.cells):
+			for c in self.get_ring(cell, r):
+				units = self.buckets.get(c, ())
+				seen += len(units)
+				found += [((x.pos - pos).length(), x) for x in self.select(units, flag=flag, kind=kind, condition=condition)]
+			safe = r*self.cell_size - 1 # units in further rings are not nearer (pos is within 0.5 of grid_pos)
+			if len([d for d, x in found if d <= safe]) >= k:
+				break
+			r += 1
+		found.sort(key=lambda f: f[0])
+		return [x for d, x in found[:k]]
+
+	def get_nearest_one(self, pos, flag=None, kind=None, condition=None):
+		"""nearest unit (see get_nearest) or None"""
+		nearest = self.get_nearest(pos, k=1, flag=flag, kind=kind, condition=condition)
+		return nearest[0] if nearest else None
+
+	def get_in_radius(self, pos, radius, flag=None, kind=None, condition=None):
+		"""[unit, ...] within radius from pos (Point) passing the filters"""
+		min_cell = self.get_cell(pos.x - radius - 1, pos.y - radius - 1)
+		max_cell = self.get_cell(pos.x + radius + 1, pos.y + radius + 1)
+		units = []
+		for cx in xrange(min_cell[0], max_cell[0] + 1):
+			for cy in xrange(min_cell[1], max_cell[1] + 1):
+				units += [x for x in self.buckets.get((cx, cy), ()) if (x.pos - pos).length() <= radius]
+		return self.select(units, flag=flag, kind=kind, condition=condition)
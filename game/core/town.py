@@ -6,6 +6,8 @@ from panda3d.core import LPoint3 as Point
 from .map import Map
 from .flag import Flag
 from .transport import Transport
+from .reservations import Reservations
+from .building_index import BuildingIndex
 from ..creatures.citizen import Valet, Builder
 from ..creatures.squad import Squad
 from ..buildings.building import Building, Storage, School, Farm
@@ -23,7 +25,9 @@ class Town(object):
 		self.citizens = []
 		self.constructions = []
 		self.construction = None # current construction
+		self.building_index = BuildingIndex(town=self)
 		self.transport = Transport(town=self)
+		self.reservations = Reservations(Map.map.grid) # of cooperative creatures
 		Map.map.add_town(self)
 
 	def __repr__(self):
@@ -33,6 +37,7 @@ class Town(object):
 		return "<Town of {}>".format(self.flag.name)
 
 	def update(self, dt=1):
+		self.reservations.update(dt=dt)
 		self.transport.update(dt=dt)
 		if len(self.constructions) > 0:
 			self.construction = self.constructions[0]
@@ -59,6 +64,7 @@ class Town(object):
 		self.show_unit(construction)
 
 	def remove_construction(self, construction):
+		self.transport.forget_field(construction)
 		self.hide_unit(construction)
 		self.constructions.remove(construction)
 
@@ -66,8 +72,10 @@ class Town(object):
 		self.buildings.append(building)
 		self.building_dict[building.kind].append(building)
 		self.show_unit(building)
+		self.transport.add_building(building)
 
 	def remove_building(self, building):
+		self.transport.remove_building(building)
 		self.hide_unit(building)
 		self.building_dict[building.kind].remove(building)
 		self.buildings.remove(building)
@@ -1,8 +1,13 @@
 # Python imports
 from time import time
-from itertools import chain
+from heapq import heappush, heappop, heapify
+from itertools import count
 # Game imports
-from core import Goal, distance
+from core import Goal, distance, to_pos
+from map import Map
+from assignment import hungarian
+from flow_field import FlowField
+from partition import Partition
 
 class Transport(object):
 	"""distribute deliveries and manage valets"""
@@ -28,12 +33,33 @@ class Transport(object):
 	kind_table[19] += ['farm'] # wheat
 	kind_table[20] += ['mill'] # flour
 	k = 0.1 # priority += k per second
+	max_pairs = 4096 # (deliveries x free valets) to be assigned at once, more ==> greedy (see distribute)
+	blocked_cost = 1e9 # of valet which can't reach the delivery
+	candidates = 8 # nearest in straight line buildings compared by walking distance (see choose)
+	chain_distance = 10.0 # between destinations of deliveries carried in one trip (see give)
 
 	def __init__(self, town):
 		self.town = town
-		self.orders = {i: [] for i in xrange(100)} # queue of orders to become delivery
-		self.queue = [] # queue of deliveries
+		self.orders = {i: [] for i in xrange(100)} # heaps of orders [goal_to, time, priority, count] to become deliveries
+		self.order_index = {} # (product, goal_to, priority) --> order (more units are added to it)
+		self.queue = [] # heap of deliveries (taken ones are skipped, see pop_delivery)
+		self.queued = set() # deliveries in the queue
+		self.sources = {} # (goal_from, product) --> queued deliveries (to be chained in one trip)
 		self.free_valets = []
+		self.counter = count() # FIFO among equal scores
+		self.dirty = set() # products with changed supply or demand
+		self.queue_is_dirty = False # new deliveries or free valets
+		self.static_version = None # of the grid (reachability of doors)
+		self.access = {} # building --> free pos at its door (the door pos itself is in the static square)
+		self.fields = {} # building --> FlowField from its door (walking distances to it)
+		self.storages = {} # storage --> free pos at its door (see get_access)
+		self.doors = {} # free pos at door --> storage (goals of the partition)
+		self.partition = Partition(Map.map.grid, []) # the nearest storage door of pos
+		self.matched = 0 # deliveries given to valets
+		self.trips = 0 # of valets (one or more deliveries from the same source)
+		self.units = 0 # of products given to valets
+		self.travel_cost = 0 # total walking distance from valets to sources of their deliveries
+		self.matching_time = 0 # s
 
 	def __repr__(self):
 		return "Transport({})".format(self.town)
@@ -42,77 +68,346 @@ class Transport(object):
 		return "<Transport in {}>".format(self.town)
 
 	def update(self, dt=1):
+		"""orders are split into deliveries only for free valets
+		(and only for products with changed supply or demand),
+		deliveries are distributed only after new ones or new free valets"""
+		if self.static_version != Map.map.grid.static_version:
+			self.static_version = Map.map.grid.static_version
+			self.queue_is_dirty = True
+			self.dirty.update(self.orders) # suppliers and storages might become reachable
+			self.update_storages()
+		if len(self.free_valets) > 0:
+			if self.queue_is_dirty:
+				self.distribute()
+			if self.dirty and len(self.free_valets) > 0:
+				self.split(len(self.free_valets))
+				self.distribute()
+
+	def split(self, n):
+		"""make up to n deliveries from orders (from the most prior one) and surplus to storages;
+		products which still might be matched stay dirty"""
+		index = self.town.building_index
+		heap = [(self.orders[i][0][0], i) for i in self.dirty if self.orders[i] and index.has_supplier(i)]
+		heapify(heap)
+		while heap and n > 0:
+			score, i = heappop(heap)
+			self.make_delivery(i)
+			n -= 1
+			if self.orders[i] and index.has_supplier(i):
+				heappush(heap, (self.orders[i][0][0], i))
+		surplus = set() # products left in producers for lack of free valets
+		for i in self.dirty:
+			for building in index.get_producers(i):
+				if n == 0:
+					surplus.add(i)
+					break
+				if self.make_delivery_to_storage(i, building):
+					n -= 1
+		self.dirty = set(i for i in self.dirty
+			if (self.orders[i] and index.has_supplier(i)) or i in surplus)
+
+	def distribute(self):
+		"""deliveries --> free valets: the most prior deliveries (one per free valet)
+		are assigned at once with minimal total distance to their sources (see assignment.hungarian)
+		or greedily to the nearest valets if there are more than Transport.max_pairs pairs"""
 		t = time()
-		for i in self.orders:
-			self.candidates = list(chain(*[[[b, b._store[i]] for b in self.town.building_dict[kind] if b._store[i] > 0] for kind in Transport.kind_table[i]]))
-			self.orders[i].sort(key=lambda o: o[2] + Transport.k*(t  -o[1]), reverse=True)
-			while len(self.orders[i]) > 0 and len(self.candidates) > 0:
-				self.make_delivery(i)
-			self.candidates = [c for c in self.candidates if not c[0].kind == 'storage']
-			while len(self.candidates) > 0:
-				self.make_delivery_to_storage(i)
-		self.queue.sort(key=lambda x: x.priority + Transport.k*(x.time - t), reverse=True)
-		while len(self.free_valets) > 0 and len(self.queue) > 0: # distribute deliveries
-			self.start_delivery()
-
-	def book_delivery(self, product, goal_to, priority):
-		"""remember order"""
-		self.orders[product].append((goal_to, time(), priority))
+		skipped = [] # no valet can reach it
+		while len(self.free_valets) > 0 and len(self.queued) > 0:
+			entries = [self.pop_delivery() for _ in xrange(min(len(self.queued), len(self.free_valets)))]
+			if len(entries)*len(self.free_valets) > Transport.max_pairs:
+				skipped += [entry for entry in entries if not self.start_delivery(entry[2])]
+			else:
+				valets = list(self.free_valets)
+				costs = [[self.get_cost(valet, entry[2]) for valet in valets] for entry in entries]
+				for entry, row, j in zip(entries, costs, hungarian(costs)):
+					if row[j] >= Transport.blocked_cost:
+						skipped.append(entry)
+					else:
+						self.give(entry[2], valets[j], row[j])
+		for entry in skipped:
+			self.push_delivery(entry)
+		self.queue_is_dirty = False
+		self.matching_time += time() - t
 
-	def make_delivery(self, i):
-		"""order --> delivery (set goal_from)"""
-		order = self.orders[i].pop(0)
-		goal_to = order[0]
-		candidate = min(self.candidates, key=lambda c: distance(c[0], goal_to))
-		Delivery(product=i, goal_from=candidate[0], goal_to=goal_to, priority=order[2] + Transport.k*(time() - order[1]))
-		candidate[0]._store[i] -= 1
-		if candidate[1] >= 2:
-			self.candidates[self.candidates.index(candidate)][1] -= 1
-		else:
-			self.candidates.remove(candidate)
-
-	def make_delivery_to_storage(self, i):
-		"""rest to storage --> delivery"""
-		candidate = self.candidates[0]
-		storage = min(self.town.building_dict['storage'], key=lambda storage: distance(candidate[0], storage))
-		Delivery(product=i, goal_from=candidate[0], goal_to=storage, priority=storage.priority)
-		candidate[0]._store[i] -= 1
-		if candidate[1] >= 2:
-			self.candidates[self.candidates.index(candidate)][1] -= 1
+	def get_cost(self, valet, delivery):
+		"""walking distance from valet to the source of delivery or Transport.blocked_cost"""
+		building = delivery.goal_from
+		if valet.grid is None:
+			return distance(valet, Goal(building.door_pos))
+		walk = self.get_walk(building, self.get_valet_pos(valet))
+		return Transport.blocked_cost if walk is None else walk
+
+	def get_field(self, building):
+		"""distance field from the door of building (see get_access) kept till it's removed,
+		it's repaired locally after static changes (see FlowField)"""
+		access = self.get_access(building)
+		field = self.fields.get(building)
+		if field is None or field.goals != set([access]):
+			if field is not None:
+				field.close()
+			field = self.fields[building] = FlowField(Map.map.grid, [access] if access else [], static=True, listening=True)
+		return field
+
+	def forget_field(self, building):
+		"""building (or construction) is removed"""
+		self.access.pop(building, None)
+		field = self.fields.pop(building, None)
+		if field is not None:
+			field.close()
+
+	def get_walk(self, building, pos):
+		"""walking distance from pos to the door of building or None (unreachable)"""
+		if pos is None:
+			return None
+		return self.get_field(building).get_distance(pos)
+
+	def choose(self, building, candidates):
+		"""candidate with the shortest walk from its door to the door of building
+		(the first one if none is reachable) or None"""
+		walks = [(self.get_walk(building, self.get_access(x)), x) for x in candidates]
+		walks = [(walk, x) for walk, x in walks if walk is not None]
+		if walks:
+			return min(walks, key=lambda wx: wx[0])[1]
+		return candidates[0] if candidates else None
+
+	def get_stats(self):
+		"""counters for statistics"""
+		return {
+			'matched': self.matched,
+			'trips': self.trips,
+			'units': self.units,
+			'travel_cost': self.travel_cost,
+			'matching_time': self.matching_time*1000} # ms
+
+	def stock_changed(self, building, i):
+		"""(imaginary) stock of product i in building has changed"""
+		self.town.building_index.update(building, i)
+		self.dirty.add(i)
+
+	def add_free_valet(self, valet):
+		self.free_valets.append(valet)
+		self.queue_is_dirty = True
+
+	@staticmethod
+	def get_score(priority, t):
+		"""heap key: priority + k*(now - t) (aging) is the biggest for the smallest key,
+		the order doesn't change with time"""
+		return Transport.k*t - priority
+
+	def add_building(self, building):
+		"""building (maybe a new supplier or storage) has been added to the town"""
+		self.town.building_index.add(building)
+		if building.kind == 'storage':
+			self.storages[building] = None
+			self.update_storages()
+		self.dirty.update(self.orders)
+
+	def remove_building(self, building):
+		self.town.building_index.remove(building)
+		if building in self.storages:
+			del self.storages[building]
+			self.update_storages()
+		self.forget_field(building)
+
+	def update_storages(self):
+		"""move goals of the partition to the current free pos at doors of storages"""
+		doors = {}
+		for storage in self.storages:
+			pos = self.storages[storage] = self.get_access(storage)
+			if pos is not None:
+				doors[pos] = storage
+		for pos in set(self.doors) - set(doors):
+			self.partition.remove_goal(pos)
+		for pos in set(doors) - set(self.doors):
+			self.partition.add_goal(pos)
+		self.doors = doors
+
+	def get_storage(self, pos):
+		"""the nearest by walk from pos storage or None (see Partition)"""
+		return self.doors.get(self.partition.get_goal(pos))
+
+	def get_home(self, valet):
+		"""the nearest by walk storage to valet (where it waits for deliveries) or None"""
+		return self.get_storage(self.get_valet_pos(valet))
+
+	def book_delivery(self, product, goal_to, priority, count=1):
+		"""remember order of count units (added to the same goal_to's order if there is one)"""
+		if count <= 0:
+			return
+		key = (product, goal_to, priority)
+		if key in self.order_index:
+			self.order_index[key][3] += count
 		else:
-			self.candidates.remove(candidate)
+			t = time()
+			order = self.order_index[key] = [goal_to, t, priority, count]
+			heappush(self.orders[product], (Transport.get_score(priority, t), next(self.counter), order))
+		self.dirty.add(product)
+
+	def get_orders(self):
+		"""{product: [order, ...]} from the most prior one"""
+		return {i: [entry[2] for entry in sorted(self.orders[i])] for i in self.orders}
+
+	def make_delivery(self, i):
+		"""the most prior order --> delivery of as many units as the nearest by walk supplier has
+		(see BuildingIndex and choose)"""
+		order = self.orders[i][0][2]
+		goal_to, t, priority = order[:3]
+		supplier = self.choose(goal_to, self.town.building_index.get_suppliers(i, goal_to.pos, k=Transport.candidates))
+		count = min(order[3], supplier._store[i])
+		order[3] -= count
+		if order[3] == 0:
+			heappop(self.orders[i])
+			del self.order_index[(i, goal_to, priority)]
+		Delivery(product=i, goal_from=supplier, goal_to=goal_to, priority=priority + Transport.k*(time() - t), count=count)
+		supplier.reserve(i, count=count)
+
+	def make_delivery_to_storage(self, i, building):
+		"""rest in building --> delivery of it to the nearest by walk storage;
+		return False if there is no reachable storage"""
+		storage = self.get_storage(self.get_access(building))
+		if storage is None:
+			return False
+		count = building._store[i]
+		Delivery(product=i, goal_from=building, goal_to=storage, priority=storage.priority, count=count)
+		building.reserve(i, count=count)
+		return True
 
 	def add_delivery(self, delivery):
-		self.queue.append(delivery)
+		self.push_delivery((Transport.get_score(delivery.priority, delivery.time), next(self.counter), delivery))
+
+	def push_delivery(self, entry):
+		delivery = entry[2]
+		heappush(self.queue, entry)
+		self.queued.add(delivery)
+		self.sources.setdefault((delivery.goal_from, delivery.product), set()).add(delivery)
+		self.queue_is_dirty = True
+
+	def take_delivery(self, delivery):
+		"""remove delivery from the queue (its heap entry is skipped later)"""
+		self.queued.remove(delivery)
+		key = (delivery.goal_from, delivery.product)
+		self.sources[key].discard(delivery)
+		if not self.sources[key]:
+			del self.sources[key]
+
+	def pop_delivery(self):
+		"""the most prior queued entry (removed from the queue)"""
+		while True:
+			entry = heappop(self.queue)
+			if entry[2] in self.queued:
+				self.take_delivery(entry[2])
+				return entry
 
 	def get_delivery(self):
-		return self.queue.pop(0)
+		"""the most prior delivery (removed from the queue)"""
+		return self.pop_delivery()[2]
+
+	def get_deliveries(self):
+		"""[delivery, ...] from the most prior one"""
+		return [entry[2] for entry in sorted(self.queue) if entry[2] in self.queued]
 
-	def start_delivery(self):
-		"""self.queue --> delivery --> valet <-- self.free_valets"""
-		delivery = self.get_delivery()
-		goal_from = Goal(delivery.goal_from.door_pos)
-		valet = min(self.free_valets, key=lambda x: distance(x, goal_from))
+	def get_access(self, building):
+		"""free pos nearest to the door of building (found again when it's taken) or None"""
+		grid = Map.map.grid
+		pos = self.access.get(building)
+		if pos is None or not grid.is_free(pos, static=True):
+			pos = self.access[building] = grid.get_near_free(to_pos(building.door_pos), static=True)
+		return pos
+
+	def get_valet_pos(self, valet):
+		"""pos where valet is (valet inside a building is at its door)"""
+		return self.get_access(valet.building) if valet.inside else valet.grid_pos
+
+	def is_reachable(self, valet, building):
+		"""check if building door might be reached by valet (see Components)"""
+		if valet.grid is None:
+			return True
+		pos, access = self.get_valet_pos(valet), self.get_access(building)
+		return pos is not None and access is not None and valet.grid.components.are_connected(pos, access)
+
+	def get_drop(self, valet, source):
+		"""building where units carried by valet are left when its deliveries are dropped:
+		the one it's in (not a construction), the nearest by walk storage or source"""
+		if valet.inside and valet.building in self.town.buildings:
+			return valet.building
+		return self.get_home(valet) or source
+
+	def get_nearest_valet(self, goal, condition):
+		"""nearest to goal free valet satisfying condition or None;
+		valets on the grid are found with its SpatialHash, others are checked directly"""
+		units = Map.map.grid.units
+		free = set(self.free_valets)
+		valets = units.get_nearest(goal.pos, flag=self.town.flag, kind='valet', condition=lambda x: x in free and condition(x))
+		valets += [x for x in self.free_valets if x not in units and condition(x)]
+		return min(valets, key=lambda x: distance(x, goal)) if valets else None
+
+	def start_delivery(self, delivery):
+		"""delivery (taken from the queue) --> the nearest valet <-- self.free_valets;
+		return False if no free valet can reach delivery.goal_from"""
+		building = delivery.goal_from
+		goal = Goal(building.door_pos)
+		valet = self.get_nearest_valet(goal, lambda x: self.is_reachable(x, building))
+		if valet is None:
+			return False
+		self.give(delivery, valet, self.get_cost(valet, delivery))
+		return True
+
+	def get_trip(self, delivery, capacity):
+		"""[delivery, ...]: delivery (the rest of it over capacity is queued again) and queued deliveries
+		from the same source with destinations near its one while they fit in capacity,
+		ordered to visit the nearest destination next"""
+		if delivery.count > capacity:
+			delivery.split(capacity)
+		load = delivery.count
+		near = [x for x in self.sources.get((delivery.goal_from, delivery.product), ())
+			if distance(x.goal_to, delivery.goal_to) <= Transport.chain_distance]
+		near.sort(key=lambda x: distance(x.goal_to, delivery.goal_to))
+		trip = [delivery]
+		for x in near:
+			if load + x.count <= capacity:
+				self.take_delivery(x)
+				trip.append(x)
+				load += x.count
+		route = [trip.pop(0)]
+		while trip:
+			nearest = min(trip, key=lambda x: distance(x.goal_to, route[-1].goal_to))
+			trip.remove(nearest)
+			route.append(nearest)
+		return route
+
+	def give(self, delivery, valet, cost=0):
 		self.free_valets.remove(valet)
-		valet.new_delivery(delivery)
+		trip = self.get_trip(delivery, valet.capacity)
+		valet.new_delivery(trip[0], trip=trip[1:])
 		valet.update_menu()
+		self.matched += len(trip)
+		self.trips += 1
+		self.units += sum(x.count for x in trip)
+		self.travel_cost += cost
 
 class Delivery(object):
 
-	def __init__(self, product, goal_from, goal_to, priority):
+	def __init__(self, product, goal_from, goal_to, priority, count=1, t=None):
 		self.product = product
 		self.goal_from = goal_from
 		self.goal_to = goal_to
 		self.priority = priority
-		self.time = time()
+		self.count = count
+		self.time = time() if t is None else t
 		assert goal_from != goal_to, "cycling delivery (on {} of {})".format(goal_to, product)
 		self.goal_to.town.transport.add_delivery(self)
 
 	def __repr__(self):
-		return "Delivery({}, {}, {}, {})".format(self.product, self.goal_from, self.goal_to, self.priority)
+		return "Delivery({}, {}, {}, {}, {})".format(self.product, self.goal_from, self.goal_to, self.priority, self.count)
 
 	def __str__(self):
-		return "<Delivery of {} from {}\nto {} with priority {}>".format(self.product, self.goal_from, self.goal_to, self.priority)
+		return "<Delivery of {} x{} from {}\nto {} with priority {}>".format(self.product, self.count, self.goal_from, self.goal_to, self.priority)
+
+	def split(self, count):
+		"""keep count units, the rest becomes a new (queued) delivery of the same age"""
+		rest = self.count - count
+		self.count = count
+		return Delivery(self.product, self.goal_from, self.goal_to, self.priority, count=rest, t=self.time)
 
-def Order(product, goal_to, priority):
-	goal_to.town.transport.book_delivery(product, goal_to, priority)
+def Order(product, goal_to, priority, count=1):
+	goal_to.town.transport.book_delivery(product, goal_to, priority, count=count)
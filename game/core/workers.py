@@ -0,0 +1,166 @@
+# Python imports
+from time import time
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
+from numpy import frombuffer, int8, zeros, argwhere
+# Game imports
+from grid import Grid
+from array_grid import ArrayGrid
+from scheduler import PathScheduler, PathRequest
+
+# shared snapshot of static occupancy (see PathWorkers.publish):
+# header = [sequence, bounded, min_x, min_y, max_x, max_y], sequence is odd while it's being written;
+# cells = flags (1: static non-free) of pos in the extent, x-major
+_header = None
+_cells = None
+_grid = None # worker's copy of the grid
+_sequence = None # of the copy
+
+def init_worker(header, cells):
+	global _header, _cells
+	_header, _cells = header, cells
+
+def read_snapshot():
+	"""rebuild worker's grid from the snapshot if it has been re-published"""
+	global _grid, _sequence
+	while True:
+		sequence = _header[0]
+		if sequence == _sequence:
+			return
+		if sequence % 2:
+			continue # being written
+		bounded, min_x, min_y, max_x, max_y = _header[1:]
+		shape = (max(max_x - min_x + 1, 0), max(max_y - min_y + 1, 0))
+		flags = frombuffer(_cells, dtype=int8, count=shape[0]*shape[1]).reshape(shape).copy()
+		if _header[0] == sequence:
+			break
+	if bounded:
+		grid = ArrayGrid((min_x, min_y, max_x, max_y))
+		grid.static_array[:] = flags
+		grid.static_sat_is_actual = False
+		blocked = list(grid.static_grid)
+	else:
+		grid = Grid()
+		blocked = [(int(i) + min_x, int(j) + min_y) for i, j in argwhere(flags)]
+		grid.static_grid = dict.fromkeys(blocked, 1)
+	grid.static_changed(blocked=blocked)
+	_grid, _sequence = grid, sequence
+
+def find_path(pos1, pos2, simplify=True, method='astar'):
+	"""Grid.get_full_path over static objects in a worker process"""
+	read_snapshot()
+	return _grid.get_full_path(pos1, pos2, check=False, simplify=simplify, static=True, method=method)
+
+class WorkerRequest(PathRequest):
+	"""static path search sent to the pool with snapshot of version (see PathWorkers.submit)"""
+
+	def __init__(self, owner, pos1, pos2, method='astar'):
+		PathRequest.__init__(self, owner, None)
+		self.pos1 = pos1
+		self.pos2 = pos2
+		self.method = method
+		self.version = None # of the static grid in the snapshot
+
+	def __repr__(self):
+		return "WorkerRequest({}, {}, {}, {})".format(self.owner, self.pos1, self.pos2, self.method)
+
+class PathWorkers(PathScheduler):
+	"""PathScheduler running static searches in a pool of worker processes:
+	workers read shared copy of static occupancy (re-published when the grid has changed
+	since the last request), results are polled in update
+	(searches on an outdated snapshot are sent again instead);
+	not static requests are served by the scheduler in this process"""
+
+	processes = 2
+	capacity = 1 << 20 # pos in the shared snapshot (grows with the extent, the pool is restarted then)
+
+	def __init__(self, grid, processes=None, budget=None):
+		PathScheduler.__init__(self, grid, budget=budget)
+		self.processes = processes or PathWorkers.processes
+		self.capacity = 0
+		self.pool = None
+		self.header = RawArray('l', 6)
+		self.cells = None
+		self.version = None # of the published snapshot
+		self.published = 0
+		self.pending = [] # requests with async results
+
+	def __repr__(self):
+		return "PathWorkers({}, {}, {})".format(self.grid, self.processes, self.budget)
+
+	def __str__(self):
+		return "<PathWorkers of {} requests ({} processes)>".format(len(self.requests), self.processes)
+
+	def start(self, capacity):
+		"""(re)start the pool with snapshot of capacity pos"""
+		self.close()
+		self.capacity = max(capacity, PathWorkers.capacity)
+		self.cells = RawArray('b', self.capacity)
+		self.version = None
+		self.pool = Pool(self.processes, initializer=init_worker, initargs=(self.header, self.cells))
+
+	def close(self):
+		if self.pool is not None:
+			self.pool.terminate()
+			self.pool = None
+
+	def publish(self):
+		"""copy static occupancy to the shared snapshot if it has changed"""
+		if self.version == self.grid.static_version and self.pool is not None:
+			return
+		extent = self.grid.get_extent() or (0, 0, -1, -1)
+		min_x, min_y, max_x, max_y = extent
+		shape = (max(max_x - min_x + 1, 0), max(max_y - min_y + 1, 0))
+		if self.pool is None or shape[0]*shape[1] > self.capacity:
+			self.start(shape[0]*shape[1])
+		if self.grid.bounded:
+			flags = self.grid.static_array > 0
+		else:
+			flags = zeros(shape, dtype=bool)
+			for x, y in self.grid.static_grid:
+				flags[x - min_x, y - min_y] = True
+		self.header[0] += 1 # odd: being written
+		frombuffer(self.cells, dtype=int8, count=shape[0]*shape[1])[:] = flags.ravel()
+		self.header[1:] = [int(self.grid.bounded)] + list(extent)
+		self.header[0] += 1
+		self.version = self.grid.static_version
+		self.published += 1
+
+	def request(self, owner, pos1, pos2, static=False, method='astar'):
+		if not static:
+			return PathScheduler.request(self, owner, pos1, pos2, static=static, method=method)
+		self.cancel(owner)
+		request = self.requests[owner] = WorkerRequest(owner, pos1, pos2, method=method)
+		self.submit(request)
+		self.pending.append(request)
+		self.max_depth = max(self.max_depth, len(self.requests))
+		return request
+
+	def submit(self, request):
+		"""send search of request to the pool with the actual snapshot"""
+		self.publish()
+		request.version = self.version
+		request.search = self.pool.apply_async(find_path, (request.pos1, request.pos2), {'method': request.method})
+
+	def update(self):
+		"""apply ready results (searched on the actual snapshot), then serve not static requests"""
+		pending, self.pending = self.pending, []
+		for request in pending:
+			if request.cancelled:
+				continue
+			if request.version != self.grid.static_version: # static objects have changed (or the pool is restarted)
+				self.submit(request)
+			if not request.search.ready():
+				self.pending.append(request)
+				continue
+			del self.requests[request.owner]
+			self.latencies.append((time() - request.time)*1000)
+			self.served += 1
+			request.owner.path_found(request.search.get())
+		PathScheduler.update(self)
+
+	def get_stats(self):
+		stats = PathScheduler.get_stats(self)
+		stats['processes'] = self.processes
+		stats['published'] = self.published
+		return stats
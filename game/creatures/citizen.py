@@ -8,6 +8,7 @@ class Citizen(Creature):
 	speed = 1.0
 	health = 1
 	enter_distance = 0.1
+	path_method = 'theta' # any-angle: fewer verticies on long walks between buildings
 
 	def __init__(self, kind, pos, town, satiety=Creature.full_satiety):
 		Creature.__init__(
@@ -69,7 +70,10 @@ class Citizen(Creature):
 
 	def leave(self, building=None):
 		building = building or self.building
-		self.pos = to_point(self.grid.get_near_free(to_pos(building.pos), static=True))
+		pos = self.grid.get_near_free(to_pos(building.pos), static=True)
+		if pos is None:
+			return # stay inside, try later
+		self.pos = to_point(pos)
 		self.model.set_pos(self.pos)
 		self.occupy_grid()
 		self.model.show()
@@ -86,6 +90,8 @@ class Citizen(Creature):
 		self.stop()
 
 	def die(self):
+		self.close_planner()
+		self.forget_path()
 		self.town.remove_citizen(self)
 		if self.has_menu():
 			base.messenger.send("Item-Hide") # CHECK: global var?!
@@ -99,15 +105,21 @@ class Citizen(Creature):
 class Valet(Citizen):
 
 	kind = 'valet'
+	replanning = True # valets walk the same busy corridors where walls are dropped
+	capacity = 4 # units carried in one trip
 
 	def __init__(self, pos, town, satiety=None):
 		Citizen.__init__(self, kind=Valet.kind, pos=pos, town=town, satiety=satiety)
+		self.capacity = Valet.capacity
 		self.product = None
+		self.count = 0 # units of product carried
 		self.delivery = None
-		self.town.transport.free_valets.append(self)
+		self.trip = [] # next deliveries from the same source (see Transport.get_trip)
+		self.home = None # the nearest storage, free valet waits there (see Transport.get_home)
+		self.town.transport.add_free_valet(self)
 
 	def auto_update(self, dt=1):
-		if self.has_delivery():
+		if self.has_delivery() or self.has_home():
 			if not self.inside:
 				if distance(self, self.goal) > self.enter_distance:
 					self.move_by_road(dt=dt)
@@ -122,38 +134,74 @@ class Valet(Citizen):
 			self.free_road(dt=dt)
 		
 	def serve(self):
-		if not self.has_product():
+		if not self.has_delivery(): # at home
+			self.home = None
+			self.goal = None
+		elif not self.has_product():
 			self.product = self.delivery.product
-			self.building.provide(self.product)
+			self.count = self.delivery.count + sum(x.count for x in self.trip)
+			self.building.provide(self.product, count=self.count)
 			self.goal = self.delivery.goal_to
 		else:
-			self.building.receive(self.product)
-			self.product = None
-			self.goal = None
-			self.delivery = None
-			self.town.transport.free_valets.append(self)
+			self.building.receive(self.product, count=self.delivery.count)
+			self.count -= self.delivery.count
+			if self.trip:
+				self.delivery = self.trip.pop(0)
+				self.goal = self.delivery.goal_to
+			else:
+				self.product = None
+				self.goal = None
+				self.delivery = None
+				self.town.transport.add_free_valet(self)
+				self.go_home()
 		self.update_menu()
 
-	def new_delivery(self, delivery):
+	def go_home(self):
+		home = self.town.transport.get_home(self)
+		if home is not None and home is not self.building:
+			self.home = self.goal = home
+
+	def new_delivery(self, delivery, trip=()):
+		if self.has_home():
+			self.stop() # on the way home
+		self.home = None
 		self.delivery = delivery
+		self.trip = list(trip)
 		self.goal = self.delivery.goal_from
 
+	def drop_deliveries(self):
+		"""return not delivered deliveries to the queue;
+		units already taken from the source are left in a building (see Transport.get_drop)
+		and delivered from there"""
+		transport = self.town.transport
+		deliveries = [self.delivery] + self.trip
+		if self.has_product():
+			building = transport.get_drop(self, self.delivery.goal_from)
+			building.receive(self.product, count=self.count)
+			deliveries = [x for x in deliveries if x.goal_to is not building]
+			for delivery in deliveries:
+				delivery.goal_from = building
+		for delivery in deliveries:
+			transport.add_delivery(delivery)
+		self.delivery = None
+		self.trip = []
+		self.product = None
+		self.count = 0
+
 	def new_auto(self):
-		self.town.transport.free_valets.append(self)
+		self.town.transport.add_free_valet(self)
+		self.go_home()
 
 	def new_manual(self):
+		self.home = None
 		if self.has_delivery():
-			self.town.transport.add_delivery(self.delivery)
-			self.delivery = None
-			self.product = None
+			self.drop_deliveries()
 		else:
 			self.town.transport.free_valets.remove(self)
 
 	def cancel_goal(self):
 		if self.auto and self.has_delivery():
-			self.town.transport.add_delivery(self.delivery)
-			self.delivery = None
-			self.product = None
+			self.drop_deliveries()
 
 	def has_delivery(self):
 		return self.delivery is not None
@@ -161,11 +209,14 @@ class Valet(Citizen):
 	def has_product(self):
 		return self.product is not None
 
+	def has_home(self):
+		return self.home is not None and self.goal is self.home
+
 	def die(self):
 		Citizen.die(self)
 		if self.auto:
 			if self.has_delivery():
-				self.town.transport.add_delivery(self.delivery)
+				self.drop_deliveries()
 			else:
 				self.town.transport.free_valets.remove(self)
 
@@ -9,6 +9,8 @@ from panda3d.core import (
 # Game imports
 from ..core.core import Goal, to_pos, to_point, distance, get_angle
 from ..core.unit import Unit
+from ..core.dstar import DStarLite
+from ..core.reservations import Reservations
 
 limit = 0.001 # motion accuracy
 
@@ -30,6 +32,10 @@ class Creature(Unit):
 	min_health = 1
 
 	grid_size = 0
+	path_method = 'astar' # see Grid.get_full_path
+	replanning = False # repair the path after grid changes keeping search state (see DStarLite)
+	cooperative = False # avoid other cooperative creatures of the town (see Reservations)
+	scheduled = True # wait for the path searched within frame budget (see PathScheduler), cooperative and flow field paths are not scheduled
 
 	r = 1.0 # TODO: add own actors
 	h = 5.0
@@ -65,6 +71,12 @@ class Creature(Unit):
 		self.grid_size = Creature.grid_size
 		self.squad = None
 		self.menu = None
+		self.flow_field = None # shared with the squad (see Squad.direct)
+		self.planner = None # started by the first repair of the path
+		self.end_pos = None # of the path
+		self.path_is_blocked = False # static objects appeared on the path (see Grid.add_path)
+		self.window = 0 # moves at the beginning of self.path taking one tick each (see Reservations)
+		self.windowed = False # the path starts with a reserved window, the next one is planned when half of it is walked
 
 	def __repr__(self):
 		return "Creature({}, {}, {}, {}, {}, {}, {})".format(self.kind, self.pos, self.town, self.direction, self.speed, self.health, self.satiety)
@@ -123,26 +135,42 @@ class Creature(Unit):
 		self.direction = get_angle(pos - self.pos)
 		self.turn()
 
-	def start_pos_interval(self, goal=None):
+	def start_pos_interval(self, goal=None, duration=None):
 		self.pos = self.model.get_pos()
 		goal = goal or self.goal
 		angle = get_angle((goal.pos - self.pos).normalized())
 		if angle is not None:
 			self.model.set_h(angle)
-		t = distance(self, goal)/self.speed
+		t = distance(self, goal)/self.speed if duration is None else duration
 		self.interval = LerpPosInterval(self.model, duration=t, pos=goal.pos)
 		self.interval.start()
 		if self.animation != 'walk':
 			self.new_animation('walk')
 
 	def move(self, dt=1):
-		if self.has_interval():
-			if self.interval.is_playing():
+		if self.is_waiting():
+			pass # for path
+		elif self.has_interval():
+			if self.has_planner() and self.planner.has_changes():
+				self.replan()
+			elif self.path_is_blocked:
+				self.interval.pause()
+				if self.replanning and self.end_pos is not None and not self.cooperative and not self.has_flow_field():
+					self.repair_path()
+				else:
+					self.new_path()
+			elif self.interval.is_playing():
 				self.update_pos()
 				# check for collisions
 			else:
-				if self.has_path():
-					self.start_pos_interval(goal=self.path.pop(0))
+				if self.windowed and self.window <= Reservations.window//2 and len(self.path) > self.window:
+					self.new_path() # next window
+				elif self.has_path():
+					if self.window > 0:
+						self.window -= 1
+						self.start_pos_interval(goal=self.path.pop(0), duration=Reservations.step)
+					else:
+						self.start_pos_interval(goal=self.path.pop(0))
 					self.update_menu()
 				else:
 					self.stop()
@@ -151,15 +179,85 @@ class Creature(Unit):
 
 	def new_path(self):
 		end_pos = self.grid.get_near_free(to_pos(self.goal.pos), static=True)
-		path = self.grid.get_full_path(self.grid_pos, end_pos, static=True)
+		self.close_planner()
+		if end_pos is None:
+			self.path_found([])
+			return
+		self.window = 0
+		self.windowed = False
+		self.end_pos = end_pos
+		# cooperative window (bounded by Reservations.max_expansions) and flow field (shared, expanded lazily)
+		# are searched at once, outside of the frame budget
+		cooperative = self.town.reservations.get_path(self, self.grid_pos, end_pos) if self.cooperative else None
+		if cooperative is None and self.cooperative: # the window search is too big: usual path, not re-windowed
+			self.town.reservations.release(self)
+		if cooperative is not None:
+			path, self.window = cooperative
+			self.windowed = True
+		elif self.has_flow_field():
+			path = self.flow_field.get_path(self.grid_pos, end_pos, method=self.path_method)
+		elif self.scheduled:
+			self.grid.scheduler.request(self, self.grid_pos, end_pos, static=True, method=self.path_method)
+			return
+		else:
+			path = self.grid.get_full_path(self.grid_pos, end_pos, static=True, method=self.path_method)
+		self.path_found(path)
+
+	def path_found(self, path):
+		"""path [pos, ..., end_pos] to the goal or [] (see new_path)"""
 		if not path:
 			self.stop()
 			print("No way ({})".format(self))
 		else:
-			self.path = [Goal(to_point(p)) for p in path[:-1]]
-			self.path.append(self.goal)
-			self.start_pos_interval(goal=self.path.pop(0))
-			self.update_menu()
+			self.follow(path)
+
+	def repair_path(self):
+		"""static objects appeared on the path: the first repair starts D* Lite,
+		it gets all grid changes then and repairs the path incrementally (see replan);
+		its first search is the longest one, so it's scheduled as the others"""
+		if not self.has_planner():
+			self.planner = DStarLite(self.grid, self.grid_pos, self.end_pos, static=True)
+		self.replan()
+
+	def replan(self):
+		"""repair the path after grid changes (see DStarLite) within the frame budget if scheduled"""
+		self.interval.pause()
+		if self.scheduled:
+			self.grid.scheduler.add(self, self.planner.iter_path(start=self.grid_pos, simplify=True))
+		else:
+			self.path_found(self.planner.get_path(start=self.grid_pos, simplify=True))
+
+	def follow(self, path):
+		"""go along path [pos, ..., end_pos] to the goal"""
+		self.path = [Goal(to_point(p)) for p in path[:-1]]
+		self.path.append(self.goal)
+		self.path_is_blocked = False
+		self.grid.add_path(self, [self.grid_pos] + path)
+		self.start_pos_interval(goal=self.path.pop(0))
+		self.update_menu()
+
+	def path_blocked(self):
+		"""called by the grid, new path is found on the next move"""
+		if not self.has_planner(): # planner gets all grid changes itself
+			self.path_is_blocked = True
+
+	def forget_path(self):
+		if self.grid is not None:
+			self.grid.remove_path(self)
+			self.grid.scheduler.cancel(self)
+		if self.cooperative:
+			self.town.reservations.release(self)
+		self.path_is_blocked = False
+		self.window = 0
+		self.windowed = False
+		self.end_pos = None
+
+	def close_planner(self):
+		if self.has_planner():
+			if self.grid is not None:
+				self.grid.scheduler.cancel(self) # its repair
+			self.planner.close()
+			self.planner = None
 
 	def __move(self, dt=1, goal=None):
 		# from direct.interval.IntervalGlobal import *
@@ -220,7 +318,7 @@ class Creature(Unit):
 					free_end_pos = None
 				path = []
 				if free_end_pos:
-					path = self.grid.get_full_path(self.grid_pos, free_end_pos, static=True)
+					path = self.grid.get_full_path(self.grid_pos, free_end_pos, static=True, method=self.path_method)
 				if not path:
 					self.stop()
 				else:
@@ -258,6 +356,9 @@ class Creature(Unit):
 			self.interval = None
 		self.cancel_goal()
 		self.goal = None
+		self.flow_field = None
+		self.close_planner()
+		self.forget_path()
 		self.path = []
 		self._turn()
 		if self.has_animation():
@@ -284,6 +385,9 @@ class Creature(Unit):
 	def has_animation(self):
 		return self.animation is not None
 
+	def is_waiting(self):
+		return self.grid is not None and self.grid.scheduler.has_request(self)
+
 	def has_interval(self):
 		return self.interval is not None
 
@@ -296,6 +400,12 @@ class Creature(Unit):
 	def has_squad(self):
 		return self.squad is not None
 
+	def has_flow_field(self):
+		return self.flow_field is not None
+
+	def has_planner(self):
+		return self.planner is not None
+
 	def has_menu(self):
 		return self.menu is not None
 
@@ -304,6 +414,8 @@ class Creature(Unit):
 			self.menu.update()
 
 	def die(self):
+		self.close_planner()
+		self.forget_path()
 		if self.has_squad():
 			self.squad.unjoin(self)
 		if self.animation is not None: # != 'die':
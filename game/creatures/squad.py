@@ -3,7 +3,8 @@ from math import ceil
 # Panda3D imports
 from panda3d.core import LVector3 as V3
 # Game imports
-from ..core.core import Goal, rotated
+from ..core.core import Goal, rotated, to_pos
+from ..core.flow_field import FlowField
 # from .warrior import Warrior
 from .creature import Creature
 from ..buildings.building import Building
@@ -14,6 +15,7 @@ class Squad(object):
 
 	def __init__(self, composition, town, n_rows=1, name=None, load=False):
 		self.composition = []
+		self.flow_field = None # to the current goal, shared by warriors
 		self.flag = town.flag
 		town.add_squad(self)
 		self.n_rows = n_rows
@@ -72,11 +74,17 @@ class Squad(object):
 		"""direct the squad to the goal"""
 		goal = goal or self.ringleader.goal # ringleader is 'nw'
 		direction = self.ringleader.direction = self.direction
+		goals = []
 		for i in xrange(len(self.composition)):
 			column = i%self.n_columns
 			row = i//self.n_columns
 			self.composition[i].direction = direction
 			self.composition[i].new_goal(goal.pos + rotated(V3(column, row, 0)*Squad.interval, direction))
+			goals.append(to_pos(self.composition[i].goal.pos))
+		grid = self.ringleader.grid
+		self.flow_field = FlowField(grid, goals, static=True) if grid is not None else None # previous one is dropped
+		for x in self.composition:
+			x.flow_field = self.flow_field
 		self.update_menu()
 
 	def attack(self, dt=1):
@@ -187,8 +195,10 @@ class Squad(object):
 			self.menu.update()
 
 	def get_nearest_to(self, pos):
-		"""return nearest to given position warrior in the squad"""
-		return min(self.composition, key=lambda x: (x.pos - pos).length())
+		"""return nearest to given position warrior in the squad (see SpatialHash)"""
+		grid = self.ringleader.grid
+		nearest = grid.units.get_nearest_one(pos, flag=self.flag, condition=lambda x: x.squad is self) if grid is not None else None
+		return nearest or min(self.composition, key=lambda x: (x.pos - pos).length())
 
 	def destroy(self, unload=True):
 		if self.has_town():
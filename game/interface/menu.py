@@ -453,7 +453,9 @@ class CitizenMenu(ItemMenu):
 
 	def update(self):
 		self.pos_label['text'] = "{} (auto: {})".format(self.citizen.grid_pos, self.citizen.auto)
-		if not self.citizen.has_interval():
+		if self.citizen.is_waiting():
+			motion = 'waiting for path'
+		elif not self.citizen.has_interval():
 			motion = 'stop'
 		elif self.citizen.interval.is_playing():
 			motion = 'moving'
@@ -390,12 +390,10 @@ class Game(ShowBase, FSM):
 		# It does bilinear interpolation between pixels for you.
 		return task.cont
 
-	def spawn_ralph(self, pos=(0, 5)):
-		"""create ralph on free pos"""
-		x, y = pos
-		while not Map.map.grid.is_free((x, y)):
-			x += 1
-		Warrior(kind='ralph', pos=Point(x, y, 0), town=self.town)
+	def spawn_ralph(self, pos=(0, 5), n=1):
+		"""create n ralphs on free pos nearest to pos"""
+		for x, y in Map.map.grid.get_near_frees(pos, n, limit=10):
+			Warrior(kind='ralph', pos=Point(x, y, 0), town=self.town)
 
 	def clean_mode(self):
 		"""clean mode and hide pointers"""
@@ -532,8 +530,8 @@ class Game(ShowBase, FSM):
 		self.accept("Construct-Farm", lambda: self.create_construction('farm'))
 		self.accept("Construct-Obstacle", lambda: self.create_obstacle())
 
-		self.accept("Print-Orders", lambda: _print_d(self.town.transport.orders))
-		self.accept("Print-Deliveries", lambda: _print(self.town.transport.queue))
+		self.accept("Print-Orders", lambda: _print_d(self.town.transport.get_orders()))
+		self.accept("Print-Deliveries", lambda: _print(self.town.transport.get_deliveries()))
 		self.accept("Print-Free-Valets", lambda: _print(self.town.transport.free_valets))
 		self.accept("Print-Buildings", lambda: _print_d(self.town.building_dict))
 